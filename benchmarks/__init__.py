@@ -0,0 +1 @@
+from .generators import uniform, euclidean, degenerate, sparse_lanes, GENERATORS
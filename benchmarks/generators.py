@@ -0,0 +1,76 @@
+import numpy as np
+
+import transportation_problem as tp
+
+
+def uniform(m: int, n: int, seed: int = 0) -> tp.TransportationProblem:
+    """
+    运价在 [1, 100] 上均匀分布，产量在 [1, 100] 上均匀分布(产地远少于销地时整体加大)，销量随机分配
+    """
+    rng = np.random.default_rng(seed)
+    supply = rng.integers(1, 101, m) + (n - 1) // m
+    demand = _split(rng, supply.sum(), n)
+    costs = rng.integers(1, 101, (m, n))
+    return tp.TransportationProblem(_named('A', supply), _named('B', demand), costs.tolist())
+
+
+def euclidean(m: int, n: int, seed: int = 0, clusters: int = 5) -> tp.TransportationProblem:
+    """
+    产地、销地聚成若干簇分布在平面上，运价为两点间距离(取整)
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.uniform(0, 1000, (clusters, 2))
+    sources = centers[rng.integers(0, clusters, m)] + rng.normal(0, 50, (m, 2))
+    sinks = centers[rng.integers(0, clusters, n)] + rng.normal(0, 50, (n, 2))
+    costs = np.rint(np.linalg.norm(sources[:, None, :] - sinks[None, :, :], axis=2)).astype(int)
+    supply = rng.integers(1, 101, m) + (n - 1) // m
+    demand = _split(rng, supply.sum(), n)
+    return tp.TransportationProblem(_named('A', supply), _named('B', demand), costs.tolist())
+
+
+def degenerate(m: int, n: int, seed: int = 0) -> tp.TransportationProblem:
+    """
+    高度退化：各产地产量都是 n 的倍数、各销地销量都是 m 的倍数，初始方案和换基中会出现大量运量为 0 的基变量
+    """
+    rng = np.random.default_rng(seed)
+    k = int(rng.integers(1, 10))
+    costs = rng.integers(1, 11, (m, n))
+    return tp.TransportationProblem(_named('A', [n * k] * m), _named('B', [m * k] * n), costs.tolist())
+
+
+def sparse_lanes(m: int, n: int, seed: int = 0, density: float = 0.05) -> tp.TransportationProblem:
+    """
+    稀疏线路：每个 产地->销地 以 density 的概率有线路。产量、销量由线路上的一个随机运输方案得出，保证有可行解
+    """
+    rng = np.random.default_rng(seed)
+    k = max(m, n)
+    cover = (np.arange(k) % m) * n + np.arange(k) % n  # 这些线路覆盖了每个产地与销地
+    extra = rng.integers(0, m, int(density * m * n)) * n + rng.integers(0, n, int(density * m * n))
+    flat = np.unique(np.concatenate([cover, extra]))
+    rows, cols = flat // n, flat % n
+    flow = rng.integers(0, 11, len(flat)) * (rng.random(len(flat)) < 0.5)
+    flow[np.isin(flat, cover)] += 1  # 保证产量、销量为正
+    supply = np.bincount(rows, weights=flow, minlength=m).astype(int)
+    demand = np.bincount(cols, weights=flow, minlength=n).astype(int)
+    lanes = tp.SparseCosts(rows, cols, rng.integers(1, 101, len(flat)), (m, n))
+    return tp.TransportationProblem.from_lanes(_named('A', supply), _named('B', demand), lanes)
+
+
+GENERATORS = {
+    'uniform': uniform,
+    'euclidean': euclidean,
+    'degenerate': degenerate,
+    'sparse_lanes': sparse_lanes,
+}
+
+
+def _split(rng, total, parts) -> np.ndarray:
+    """
+    把 total 随机分成 parts 个正整数(total >= parts)
+    """
+    cuts = np.sort(rng.choice(np.arange(1, total), parts - 1, replace=False)) if parts > 1 else np.array([], dtype=int)
+    return np.diff(np.concatenate([[0], cuts, [total]]))
+
+
+def _named(prefix, quantities) -> list:
+    return [(f'{prefix}{i}', int(q)) for i, q in enumerate(quantities)]
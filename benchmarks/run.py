@@ -0,0 +1,187 @@
+"""
+运输问题求解性能基准
+
+对各种规模与类型的随机问题，运行 transportation_problem 导出的每一种 初始化×检验×优化 组合与每一种求解器，
+记录换基次数、用时与内存峰值；可保存为 JSON 基线，之后与基线比较以发现性能退化。
+
+    python -m benchmarks.run --sizes 10 50 200 --save baseline.json
+    python -m benchmarks.run --sizes 10 50 200 --compare baseline.json
+"""
+import argparse
+import json
+import platform
+import signal
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+import transportation_problem as tp
+from benchmarks.generators import GENERATORS
+
+DEFAULT_SIZES = (10, 50, 200, 1000, 2000)
+
+
+def methods() -> list:
+    """
+    transportation_problem 导出的所有 初始化×检验×优化 组合与求解器
+    :return: [(名称, solve() 的参数), ...]
+    """
+    exported = [getattr(tp, name) for name in tp.__all__] if hasattr(tp, '__all__') else list(vars(tp).values())
+    classes = [c for c in exported if isinstance(c, type)]
+
+    def concrete(base):
+        return [c for c in classes if issubclass(c, base) and c is not base]
+
+    result = []
+    for initer in concrete(tp.TransportationIniter):
+        for checker in concrete(tp.TransportationChecker):
+            for optimizer in concrete(tp.TransportationOptimizer):
+                result.append((f'{initer.__name__}/{checker.__name__}/{optimizer.__name__}',
+                               dict(initer_class=initer, checker_class=checker, optimizer_class=optimizer)))
+    for solver in concrete(tp.TransportationSolver):
+        result.append((solver.__name__, dict(solver_class=solver)))
+    return result
+
+
+class _Timeout(Exception):
+    pass
+
+
+def _raise_timeout(signum, frame):
+    raise _Timeout()
+
+
+def run_case(problem, options, timeout=None, memory=True, repeat=3) -> dict:
+    """
+    求解 repeat 次取最短用时，每次超过 timeout 秒(依赖 SIGALRM)则放弃；测量内存峰值的那次求解同样限时
+    :return: {'status', 'seconds', 'pivots', 'total_cost', 'peak_bytes'}
+    """
+    record = dict(status='ok', seconds=None, pivots=None, total_cost=None, peak_bytes=None)
+    previous = signal.signal(signal.SIGALRM, _raise_timeout) if timeout else None
+    try:
+        for _ in range(repeat):
+            if timeout:
+                signal.setitimer(signal.ITIMER_REAL, timeout)
+            start = time.perf_counter()
+            result = problem.solve(**options)
+            seconds = time.perf_counter() - start
+            record['seconds'] = seconds if record['seconds'] is None else min(record['seconds'], seconds)
+            if timeout:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+        record['pivots'] = result.stats.pivots
+        record['total_cost'] = float(result.total_cost)
+        if memory:  # tracemalloc 会拖慢求解，内存峰值单独再求解一次，同样限时；超时则不记录内存峰值
+            tracemalloc.start()
+            if timeout:
+                signal.setitimer(signal.ITIMER_REAL, timeout)
+            try:
+                problem.solve(**options)
+                record['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+            except _Timeout:
+                pass
+    except _Timeout:
+        record['status'] = 'timeout'
+    except Exception as e:
+        record['status'] = f'error: {type(e).__name__}: {e}'
+    finally:
+        if timeout:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+    return record
+
+
+def run(sizes=DEFAULT_SIZES, generators=None, method_filter=None, seed=0, timeout=60, memory=True, repeat=3,
+        echo=print) -> list:
+    """
+    运行基准
+    :param sizes: 问题规模，n 表示 n×n
+    :param generators: 使用的问题生成器名称，None 为全部
+    :param method_filter: 只运行名称中包含这个字符串的组合
+    :param seed: 随机种子
+    :param timeout: 每次求解的时限(秒)
+    :param memory: 是否测量内存峰值
+    :param repeat: 每个组合求解的次数，取最短用时
+    :param echo: 输出进度的函数
+    :return: 各次运行的记录
+    """
+    records = []
+    for generator in generators or GENERATORS:
+        for size in sizes:
+            problem = GENERATORS[generator](size, size, seed)
+            for name, options in methods():
+                if method_filter and method_filter not in name:
+                    continue
+                record = dict(generator=generator, size=size, seed=seed, method=name)
+                record.update(run_case(problem, options, timeout, memory, repeat))
+                records.append(record)
+                echo(_format(record))
+    return records
+
+
+def compare(records, baseline, tolerance=0.2, slack=1e-3) -> list:
+    """
+    与基线比较，找出变慢超过 tolerance (且超过 slack 秒)、换基次数增加、总运价不同或不再成功的运行
+    :return: 退化的描述
+    """
+    old = {(r['generator'], r['size'], r['seed'], r['method']): r for r in baseline['records']}
+    regressions = []
+    for r in records:
+        b = old.get((r['generator'], r['size'], r['seed'], r['method']))
+        if b is None or b['status'] != 'ok':
+            continue
+        key = f"{r['generator']} {r['size']}x{r['size']} {r['method']}"
+        if r['status'] != 'ok':
+            regressions.append(f'{key}: {r["status"]}')
+        elif r['seconds'] > b['seconds'] * (1 + tolerance) + slack:
+            regressions.append(f'{key}: {b["seconds"]:.4f}s -> {r["seconds"]:.4f}s')
+        elif r['pivots'] > b['pivots']:
+            regressions.append(f'{key}: pivots {b["pivots"]} -> {r["pivots"]}')
+        elif not np.isclose(r['total_cost'], b['total_cost']):
+            regressions.append(f'{key}: total cost {b["total_cost"]} -> {r["total_cost"]}')
+    return regressions
+
+
+def _format(record) -> str:
+    s = f"{record['generator']:>12} {record['size']:>5} {record['method']:<75}"
+    if record['status'] != 'ok':
+        return s + record['status']
+    s += f" {record['seconds']:10.4f}s {record['pivots']:>8} pivots"
+    if record['peak_bytes'] is not None:
+        s += f" {record['peak_bytes'] / 2 ** 20:10.2f} MiB"
+    return s
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--generators', nargs='+', choices=list(GENERATORS))
+    parser.add_argument('--methods', help='只运行名称中包含这个字符串的组合')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--timeout', type=float, default=60)
+    parser.add_argument('--repeat', type=int, default=3, help='每个组合求解的次数，取最短用时')
+    parser.add_argument('--no-memory', action='store_true', help='不测量内存峰值')
+    parser.add_argument('--save', help='把结果保存为 JSON 基线')
+    parser.add_argument('--compare', help='与 JSON 基线比较，有退化时以状态 1 退出')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='允许的用时增长比例')
+    args = parser.parse_args(argv)
+
+    records = run(args.sizes, args.generators, args.methods, args.seed, args.timeout, not args.no_memory, args.repeat)
+    if args.save:
+        meta = dict(python=platform.python_version(), numpy=np.__version__, platform=platform.platform())
+        with open(args.save, 'w') as f:
+            json.dump(dict(meta=meta, records=records), f, indent=1)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(records, json.load(f), args.tolerance)
+        for r in regressions:
+            print('REGRESSION', r)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,5 @@
+import asyncio
+
 import transportation_problem as tp
 
 
@@ -14,6 +16,42 @@ def tests():
     r = p.solve(tp.VogelIniter, tp.PotentialChecker, tp.ClosedLoopAdjustmentOptimizer)
     assert r.transportation == [[1.0, 0.0, 0.0, 13.0], [2.0, 13.0, 12.0, 0.0], [19.0, 0.0, 0.0, 0.0]], r.transportation
     print(r)
+    # 西北角法初始化，生成树位势法检验，闭回路法优化调整
+    r = p.solve(tp.NorthwestCornerIniter, tp.SpanningTreePotentialChecker, tp.ClosedLoopAdjustmentOptimizer)
+    assert r.transportation == [[1.0, 0.0, 0.0, 13.0], [2.0, 13.0, 12.0, 0.0], [19.0, 0.0, 0.0, 0.0]], r.transportation
+    print(r)
+    # 整数模式：运量、位势、检验数都是精确的整数
+    r = p.solve(checker_class=tp.SpanningTreePotentialChecker, integer=True)
+    assert r.transportation == [[1, 0, 0, 13], [2, 13, 12, 0], [19, 0, 0, 0]], r.transportation
+    # Bland 规则与扰动都能避免退化时的循环
+    r = p.solve(tp.NorthwestCornerIniter, tp.SpanningTreePotentialChecker, pricing_class=tp.BlandPricing)
+    assert r.total_cost == 232.0 and r.status == 'optimal', r.transportation
+    r = p.solve(tp.NorthwestCornerIniter, tp.SpanningTreePotentialChecker, perturb=True)
+    assert r.total_cost == 232.0 and r.stats.degenerate_pivots == 0, r.transportation
+    # 限制换基次数：返回目前最好的可行方案
+    r = p.solve(tp.NorthwestCornerIniter, tp.SpanningTreePotentialChecker, max_iter=1)
+    assert r.status == 'iteration_limit' and r.stats.pivots == 1, r.status
+    assert r.lower_bound <= 232 <= r.total_cost and r.gap > 0, (r.lower_bound, r.total_cost)
+    r = p.solve(tp.VogelIniter, tp.SpanningTreePotentialChecker, gap=0.5)
+    assert r.total_cost <= 232 * 1.5 and r.gap <= 0.5, r.gap
+    # 灵敏度分析：A1->B4 的运价在 [-inf, 5] 内变化时，最优方案不变
+    sa = p.solve().sensitivity
+    assert sa.cost_upper[0][3] == 5 and sa.quantity_range(1, 2) == (-12, float('inf')), sa.cost_upper
+    # 在 asyncio 服务中求解，不阻塞事件循环
+    r = asyncio.run(tp.solve_async(p, checker_class=tp.SpanningTreePotentialChecker))
+    assert r.total_cost == 232.0, r.transportation
+    # 产销量与运价有少量变化时，从上一次的最优解热启动
+    s2 = [('A1', 16), ('A2', 25), ('A3', 19)]
+    c2 = [[6, 7, 5, 3], [8, 4, 3, 7], [5, 9, 10, 6]]
+    p2 = tp.TransportationProblem(s2, d, c2)
+    r2 = p2.solve(checker_class=tp.SpanningTreePotentialChecker, warm_start=r)
+    assert r2.total_cost == 240.0, r2.transportation
+    print(r2)
+    # 产销不平衡：自动添加运价为 0 的虚拟销地，结果中不含虚拟销地
+    d3 = [('B1', 20), ('B2', 13), ('B3', 12), ('B4', 10)]
+    r3 = tp.TransportationProblem(s, d3, c).solve()
+    r4 = tp.TransportationProblem(s, d3 + [('dummy', 5)], [row + [0] for row in c]).solve()
+    assert r3.total_cost == r4.total_cost and len(r3.transportation[0]) == 4, r3.transportation
 
     sp = [('I', 2500), ('II', 2500), ('III', 5000)]
     dm = [('A', 1500), ('B', 2000), ('C', 3000), ('D', 3500)]
@@ -21,7 +59,9 @@ def tests():
     # 默认最小元素法初始化，位势法检验，闭回路法优化调整
     pb = tp.TransportationProblem(sp, dm, ct)
     rt = pb.solve()
+    assert rt.stats.objective[-1] == rt.total_cost, rt.stats.objective
     print(rt)
+    print(rt.stats)
 
     spy = [('A', 400), ('B', 450), ('C', 70)]
     dmd = [('甲', 290), ('甲\'', 30), ('乙', 250), ('丙', 270), ('丙\'', 80)]
@@ -30,6 +70,37 @@ def tests():
     # 伏格尔法初始化
     res = pbm.solve(tp.VogelIniter)
     print(res)
+    # 网络单纯形法
+    res = pbm.solve(solver_class=tp.NetworkSimplexSolver)
+    assert res.total_cost == 14650.0, res.total_cost
+    print(res)
+
+    # 稀疏线路表：不存在的线路不用再写成 999
+    lanes = [(i, j, c) for i, row in enumerate(cst) for j, c in enumerate(row) if c != 999]
+    pbm = tp.TransportationProblem.from_lanes(spy, dmd, lanes)
+    res = pbm.solve(solver_class=tp.NetworkSimplexSolver)
+    assert res.total_cost == 14650.0, res.total_cost
+    res = pbm.solve(tp.VogelIniter)
+    assert res.total_cost == 14650.0, res.total_cost
+    print(res)
+    # 西北角法的初始方案用到了不存在的线路：先把它们的运量清零，再按 max_iter 停止
+    lanes = [(0, 1, 4), (0, 2, 6), (1, 0, 3), (1, 2, 5), (2, 0, 7), (2, 1, 2)]
+    pbm = tp.TransportationProblem.from_lanes([('A1', 5), ('A2', 6), ('A3', 4)],
+                                              [('B1', 6), ('B2', 5), ('B3', 4)], lanes)
+    res = pbm.solve(tp.NorthwestCornerIniter, tp.SpanningTreePotentialChecker, max_iter=0)
+    assert {(i, j) for i, j in zip(res.rows, res.cols)} <= {(i, j) for i, j, _ in lanes}, res.transportation
+    assert res.stats.pivots > 0 and res.total_cost == 54.0, res.total_cost
+    # 下界只取存在的线路，不会被大 M 拉低
+    assert 0 < res.lower_bound <= 54.0, res.lower_bound
+    res = pbm.solve(tp.NorthwestCornerIniter, tp.SpanningTreePotentialChecker, gap=0.5)
+    assert res.status in ('optimal', 'gap_limit') and res.total_cost <= 54.0 * 1.5, res.status
+
+    # 线路把问题分成互不相连的两部分时，分别求解再拼起来
+    lanes = [(0, 0, 6), (0, 1, 7), (1, 0, 8), (1, 1, 4), (2, 2, 2), (2, 3, 7), (3, 2, 10), (3, 3, 6)]
+    pbm = tp.TransportationProblem.from_lanes([('A1', 10), ('A2', 5), ('A3', 8), ('A4', 4)],
+                                              [('B1', 6), ('B2', 9), ('B3', 5), ('B4', 7)], lanes)
+    res = pbm.solve(checker_class=tp.SpanningTreePotentialChecker)
+    assert res.total_cost == 139.0 and res.total_cost == tp.solve_decomposed(pbm).total_cost, res.transportation
 
 
 if __name__ == '__main__':
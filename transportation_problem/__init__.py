@@ -1,5 +1,17 @@
 from .problem import TransportationProblem
-from .closed_loop_method import ClosedLoopMethod
-from .initer import TransportationIniter, MinimumElementIniter, NorthwestCornerIniter, VogelIniter
-from .checker import TransportationChecker, PotentialChecker
+from .closed_loop_method import ClosedLoopMethod, TreeClosedLoopMethod
+from .basis import TransportationBasis
+from .initer import TransportationIniter, MinimumElementIniter, NorthwestCornerIniter, VogelIniter, PortfolioIniter
+from .checker import TransportationChecker, PotentialChecker, SpanningTreePotentialChecker
 from .optimizer import TransportationOptimizer, ClosedLoopAdjustmentOptimizer
+from .pricing import TransportationPricing, DantzigPricing, FirstNegativePricing, BlandPricing, PartialPricing, BlockSearchPricing
+from .solver import TransportationSolver, NetworkSimplexSolver
+from .lanes import SparseCosts
+from .core import CostIndex
+from .stats import SolveStats
+from .sensitivity import SensitivityAnalysis
+from .loaders import load_csv, load_npz, load_npy, load_memmap, save_npz
+from .batch import solve_batch
+from .parallel import solve_parallel, solve_portfolio, solve_decomposed
+from .cache import SolveCache
+from .service import solve_async, SolveService
@@ -0,0 +1,352 @@
+from collections import deque
+
+import numpy as np
+from transportation_problem.core import CostIndex
+
+
+class TransportationBasis(object):
+    """
+    TransportationBasis 运输问题的基，在 solve() 的各次迭代之间共享，原址更新
+
+    基变量构成一棵连接 产地(行节点 0..m-1) 与 销地(列节点 m..m+n-1) 的生成树，以节点 0 为根。
+
+    整数模式(integer=True)下运量为 int64；若运价都是整数，运价与位势也用 int64，检验数是精确的整数，不会因浮点误差而出现接近 0 的负检验数。
+
+    属性：
+        - index: 运价的 CostIndex，与检验器、定价规则共用
+        - costs: 运价, m×n ndarray (即 index.costs，有虚拟的行、列时才补齐，换基与定价都不用它)
+        - integer: 是否为整数模式
+        - transportation: 运量表, m×n ndarray, 非基变量处为 0
+        - is_basic: 基变量掩码, m×n bool ndarray
+        - parent: 生成树中各节点的父节点，根为 -1
+        - depth: 生成树中各节点的深度，根为 0
+        - u, v: 位势，对基变量有 u_i + v_j = c_ij
+        - potential_updates: 累计重新计算的位势个数
+    """
+
+    def __init__(self, transportation, costs, integer=False):
+        super().__init__()
+        self.index = costs if isinstance(costs, CostIndex) else CostIndex(costs)
+        self.integer = integer
+        transportation = np.asarray(transportation, dtype=float)
+        self.shape = self.index.shape
+
+        rows, cols = _spanning_tree(transportation)
+        self.is_basic = np.zeros(self.shape, dtype=bool)
+        self.is_basic[rows, cols] = True
+        self.transportation = np.where(self.is_basic, np.nan_to_num(transportation), 0.0)
+        potential_dtype = float
+        if integer:
+            if not np.array_equal(self.transportation, np.round(self.transportation)):
+                raise ValueError('integer mode requires integral quantities')
+            self.transportation = self.transportation.astype(np.int64)
+            base = self.index.base
+            if base.dtype.kind == 'f' and np.all(np.isfinite(base)) and np.array_equal(base, np.round(base)):
+                self.index = self.index.with_base(base.astype(np.int64))
+            if self.index.base.dtype.kind in 'iu':
+                potential_dtype = np.int64
+
+        m, n = self.shape
+        self._adjacency = [set() for _ in range(m + n)]
+        for r, c in zip(rows.tolist(), cols.tolist()):
+            self._adjacency[r].add(m + c)
+            self._adjacency[m + c].add(r)
+        self.parent = [-1] * (m + n)
+        self.depth = [0] * (m + n)
+        self.u = np.zeros(m, dtype=potential_dtype)
+        self.v = np.zeros(n, dtype=potential_dtype)
+        self.potential_updates = 0
+        self._reroot(0, -1)
+
+    @property
+    def costs(self) -> np.ndarray:
+        return self.index.costs
+
+    def sigma(self) -> np.ndarray:
+        """
+        求检验数: $\\sigma_{ij} = c_{ij} - (u_i + v_j)$，基变量处为 nan；
+        整数模式下检验数为整数，基变量处为 0 (用 is_basic 区分基变量)
+        :return: 检验数
+        """
+        sigma = self.index.reduced(self.u, self.v)
+        sigma[self.is_basic] = np.nan if sigma.dtype.kind == 'f' else 0
+        return sigma
+
+    def get_closed_loop(self, r, c) -> (np.ndarray, np.ndarray):
+        """
+        找从非基变量 (r, c) 出发的闭回路：即生成树中 列节点 c 到 行节点 r 的路径，再加上 (r, c) 本身
+        :param r: 起点行索引
+        :param c: 起点列索引
+        :return: (rows, cols) 闭回路上依次各点的行、列索引，下标 0 为 (r, c)
+        """
+        m = self.shape[0]
+        x, y = m + c, r
+        head, tail = [x], [y]  # 从两端分别往上走，直到相遇
+        while x != y:
+            if self.depth[x] >= self.depth[y]:
+                x = self.parent[x]
+                head.append(x)
+            else:
+                y = self.parent[y]
+                tail.append(y)
+        path = head + tail[-2::-1]  # 列节点 c -> ... -> 行节点 r
+
+        rows, cols = [r], [c]
+        for a, b in zip(path, path[1:]):
+            rows.append(min(a, b))
+            cols.append(max(a, b) - m)
+        return np.array(rows), np.array(cols)
+
+    def pivot(self, r, c, leaving_rule='first') -> (np.ndarray, np.ndarray):
+        """
+        换基：(r, c) 进基，闭回路上运量最小的奇数位置出基。原址更新运量、生成树与位势
+        :param r: 进基变量行索引
+        :param c: 进基变量列索引
+        :param leaving_rule: 运量最小的格子有多个时选哪个出基：'first' 为闭回路上的第一个，'lowest_index' 为下标最小的
+        :return: (rows, cols) 调整所用的闭回路
+        """
+        m = self.shape[0]
+        rows, cols = self.get_closed_loop(r, c)
+        # 闭回路中最小的运量，下标从0开始，所以取奇数(1, 3)
+        odd_trans = self.transportation[rows[1::2], cols[1::2]]
+        k = _leaving(odd_trans, rows[1::2], cols[1::2], leaving_rule)
+        min_trans = odd_trans[k]
+        leave_r, leave_c = rows[2 * k + 1], cols[2 * k + 1]
+        # 调整，偶加奇减(0+, 1-, 2+, 3-)
+        self.transportation[rows[0::2], cols[0::2]] += min_trans
+        self.transportation[rows[1::2], cols[1::2]] -= min_trans
+        self.transportation[leave_r, leave_c] = 0
+
+        # 更新基变量与生成树：断开出基变量对应的边，被断开的子树通过进基变量重新挂到树上
+        self.is_basic[leave_r, leave_c] = False
+        self.is_basic[r, c] = True
+        a, b = int(leave_r), m + int(leave_c)
+        child = a if self.parent[a] == b else b
+        self._adjacency[a].discard(b)
+        self._adjacency[b].discard(a)
+        self._adjacency[r].add(m + c)
+        self._adjacency[m + c].add(r)
+        # 进基变量中落在子树里的那一端成为子树的新根
+        inner, outer = (r, m + c) if self._is_descendant(r, child) else (m + c, r)
+        self._reroot(inner, outer)
+        return rows, cols
+
+    def copy(self):
+        """
+        :return: 当前基的副本，运价表共用
+        """
+        basis = object.__new__(TransportationBasis)
+        basis.index = self.index
+        basis.integer = self.integer
+        basis.shape = self.shape
+        basis.is_basic = self.is_basic.copy()
+        basis.transportation = self.transportation.copy()
+        basis._adjacency = [set(a) for a in self._adjacency]
+        basis.parent = list(self.parent)
+        basis.depth = list(self.depth)
+        basis.u = self.u.copy()
+        basis.v = self.v.copy()
+        basis.potential_updates = self.potential_updates
+        return basis
+
+    def with_quantities(self, supply, demand):
+        """
+        保持基变量(生成树)不变，按新的产量、销量重新求出基变量的运量
+        :param supply: 各产地产量
+        :param demand: 各销地销量
+        :return: 新的 TransportationBasis；若有基变量的运量为负(这个基对新问题不可行)，返回 None
+        """
+        m, n = self.shape
+        number = int if self.integer else float
+        remaining = [number(q) for q in supply] + [number(q) for q in demand]
+        if len(remaining) != m + n:
+            raise ValueError('supply/demand do not match the basis shape')
+        tolerance = 0 if self.integer else 1e-9 * max(max(remaining, default=0), 1)
+        transportation = np.zeros(self.shape, dtype=self.transportation.dtype)
+        # 从最深的节点开始，每个节点剩下的 产量/销量 都只能经过连到父节点的那条边
+        for x in sorted(range(m + n), key=self.depth.__getitem__, reverse=True):
+            p = self.parent[x]
+            if p < 0:
+                continue
+            flow = remaining[x]
+            if flow < -tolerance:
+                return None
+            r, c = (x, p - m) if x < m else (p, x - m)
+            transportation[r, c] = max(flow, 0)
+            remaining[p] -= flow
+
+        basis = self.copy()
+        basis.transportation = transportation
+        return basis
+
+    def lower_bound(self, supply, demand, allowed=None) -> float:
+        """
+        由位势得到的最优总运价的下界(拉格朗日对偶)：固定 v，取 $u_i = \\min_j (c_{ij} - v_j)$，
+        再固定 u，取 $v_j = \\min_i (c_{ij} - u_i)$，得到的 (u, v) 是对偶可行解，$\\sum_i a_i u_i + \\sum_j b_j v_j$
+        不超过最优总运价；从 u 出发同理，取两者中较大的一个。
+        所有检验数非负(已达到最优)时，它等于最优总运价
+        :param supply: 各产地产量
+        :param demand: 各销地销量
+        :param allowed: 可用线路的布尔掩码；给出时 min 只取可用的线路，用大 M 代替的线路不会把下界拉低
+        :return: 下界，是只走可用线路时最优总运价的下界
+        """
+        a, b = np.asarray(supply, dtype=float), np.asarray(demand, dtype=float)
+        u, v = self.u.astype(float), self.v.astype(float)
+        return max(self._dual_objective(a, b, None, v, allowed), self._dual_objective(a, b, u, None, allowed))
+
+    def _dual_objective(self, a, b, u, v, allowed) -> float:
+        """
+        给定 v 时先求出最大的可行 u，再固定 u 求出最大的可行 v，返回对偶目标值；给定 u 时反过来。
+        产量(销量)为 0 的行(列)不受约束，不参与 min 也不计入目标值
+        :param a, b: 各行、各列的产销量
+        :param u, v: 各行、各列的位势，只给出其中一个
+        :param allowed: 可用线路的布尔掩码，None 表示都可用
+        :return: $\\sum_i a_i u_i + \\sum_j b_j v_j$
+        """
+        rows, cols = a > 0, b > 0
+
+        def reduced(u, v):  # c_ij - u_i - v_j，不可用的线路为 inf
+            reduced = self.index.reduced(u, v).astype(float, copy=False)
+            if allowed is not None:
+                reduced[~allowed] = np.inf
+            return reduced
+
+        if u is None:
+            u = np.min(reduced(np.zeros(len(a)), v)[:, cols], axis=1, initial=np.inf)
+            v = np.min(reduced(u, np.zeros(len(b)))[rows], axis=0, initial=np.inf)
+        else:
+            v = np.min(reduced(u, np.zeros(len(b)))[rows], axis=0, initial=np.inf)
+            u = np.min(reduced(np.zeros(len(a)), v)[:, cols], axis=1, initial=np.inf)
+        return float(a[rows] @ u[rows] + b[cols] @ v[cols])
+
+    def tolist(self) -> list:
+        """
+        :return: 运量表，非基变量处为 nan
+        """
+        return np.where(self.is_basic, self.transportation, np.nan).tolist()
+
+    def _is_descendant(self, x, ancestor) -> bool:
+        while self.depth[x] > self.depth[ancestor]:
+            x = self.parent[x]
+        return x == ancestor
+
+    def _reroot(self, root, parent):
+        """
+        以 root 为根、parent 为父节点，重新遍历 root 所在的子树，更新其中各节点的父节点、深度与位势
+        """
+        m = self.shape[0]
+        self.parent[root] = parent
+        self.depth[root] = self.depth[parent] + 1 if parent >= 0 else 0
+        if parent >= 0:
+            r, c = (root, parent - m) if root < m else (parent, root - m)
+            delta = self.index.cost(r, c) - self.u[r] - self.v[c]  # 子树中所有 u 加 delta、v 减 delta(或相反)
+            if root >= m:
+                delta = -delta
+        else:
+            delta = None
+            self.u[0] = 0
+
+        rows, cols = [], []
+        queue = deque([root])
+        while queue:
+            x = queue.popleft()
+            (rows if x < m else cols).append(x if x < m else x - m)
+            for y in self._adjacency[x]:
+                if y != self.parent[x]:
+                    self.parent[y] = x
+                    self.depth[y] = self.depth[x] + 1
+                    if delta is None:
+                        i, j = (x, y - m) if x < m else (y, x - m)
+                        if y < m:
+                            self.u[y] = self.index.cost(i, j) - self.v[j]
+                        else:
+                            self.v[y - m] = self.index.cost(i, j) - self.u[i]
+                    queue.append(y)
+
+        self.potential_updates += len(rows) + len(cols)
+        if delta is not None:
+            self.u[rows] += delta
+            self.v[cols] -= delta
+
+
+def _leaving(quantities, rows, cols, leaving_rule) -> int:
+    """
+    在闭回路的奇数位置中选出基变量
+    :param quantities: 各奇数位置的运量
+    :param rows, cols: 各奇数位置的行、列索引
+    :param leaving_rule: 'first' 或 'lowest_index'
+    :return: 出基变量在奇数位置中的下标
+    """
+    if leaving_rule == 'first':
+        return int(np.argmin(quantities))
+    if leaving_rule == 'lowest_index':
+        ties = np.flatnonzero(quantities == np.min(quantities))
+        return int(ties[np.lexsort((cols[ties], rows[ties]))[0]])
+    raise ValueError(f'unknown leaving rule: {leaving_rule}')
+
+
+def _spanning_tree(transportation) -> (np.ndarray, np.ndarray):
+    """
+    把基变量看作连接 产地(行节点 0..m-1) 与 销地(列节点 m..m+n-1) 的边，求出一棵生成树
+
+    优先使用运量 > 0 的基变量，其次是运量为 0 的基变量（退化解）；
+    若基变量不足以连通所有节点，则补充运量为 0 的格子作为基变量。
+    :param transportation: 运量表，nan 表示非基变量
+    :return: (rows, cols) 生成树中 m+n-1 个基变量的行、列索引
+    """
+    transportation = np.asarray(transportation, dtype=float)
+    m, n = transportation.shape
+    parent = list(range(m + n))  # 并查集
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    rows, cols = [], []
+    basic = ~np.isnan(transportation)
+    positive = basic & (np.nan_to_num(transportation) > 0)
+    for k in np.concatenate([np.flatnonzero(positive), np.flatnonzero(basic & ~positive)]).tolist():
+        if len(rows) == m + n - 1:
+            break
+        r, c = divmod(k, n)
+        a, b = find(r), find(m + c)
+        if a != b:  # 不成环才能加入
+            parent[a] = b
+            rows.append(r)
+            cols.append(c)
+
+    # 退化：基变量不足 m+n-1 个，补运量为 0 的格子把森林连成树
+    if len(rows) < m + n - 1:
+        roots = np.array([find(x) for x in range(m + n)])
+        while len(rows) < m + n - 1:
+            crossing = roots[:m, None] != roots[None, m:]
+            r, c = np.unravel_index(np.argmax(crossing), crossing.shape)
+            roots[roots == roots[r]] = roots[m + c]
+            rows.append(int(r))
+            cols.append(int(c))
+
+    return np.array(rows, dtype=int), np.array(cols, dtype=int)
+
+
+# Tests
+def _basis_pivot_test():
+    ct = [[3, 11, 3, 10], [1, 9, 2, 8], [7, 4, 10, 5]]
+    ts = [[3, 4, np.nan, np.nan], [np.nan, 2, 2, np.nan], [np.nan, np.nan, 3, 6]]  # 西北角法
+    basis = TransportationBasis(ts, ct)
+    sigma = basis.sigma()
+    while np.nanmin(sigma) < 0:
+        r, c = np.unravel_index(np.nanargmin(sigma), sigma.shape)
+        basis.pivot(r, c)
+        sigma = basis.sigma()
+        fresh = TransportationBasis(basis.tolist(), ct)  # 增量更新的位势应与重新计算的一致
+        assert np.allclose(basis.u, fresh.u) and np.allclose(basis.v, fresh.v)
+    assert np.sum(basis.transportation * np.array(ct)) == 85, basis.tolist()
+    assert basis.lower_bound([7, 4, 9], [3, 6, 5, 6]) == 85
+    assert TransportationBasis(ts, ct).lower_bound([7, 4, 9], [3, 6, 5, 6]) <= 85
+    print("basis_pivot_test pass")
+
+
+if __name__ == '__main__':
+    _basis_pivot_test()
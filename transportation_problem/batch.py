@@ -0,0 +1,60 @@
+from transportation_problem.problem import TransportationProblem
+from transportation_problem.core import CostIndex
+from transportation_problem.initer import MinimumElementIniter
+from transportation_problem.checker import SpanningTreePotentialChecker
+from transportation_problem.optimizer import ClosedLoopAdjustmentOptimizer
+
+
+def solve_batch(costs, scenarios, initer_class=MinimumElementIniter, checker_class=SpanningTreePotentialChecker,
+                optimizer_class=ClosedLoopAdjustmentOptimizer, warm_start=True):
+    """
+    用同一张运价表求解一批(产量, 销量)不同的运输问题
+
+    运价表的预处理(排序等)只做一次，由所有问题共享；
+    warm_start 为 True 时，每个问题都尝试从上一个问题的最优基开始迭代。
+
+    :param costs:           运价: [[1, 2, 3, ...], [4, 5, 6, ...], ...] 或 CostIndex
+    :param scenarios:       可迭代的 (supply, demand)，格式同 TransportationProblem: [('name', 产量), ...]
+    :param initer_class:    初始方案求解器，TransportationIniter 的子类
+    :param checker_class:   最优方案检验器，TransportationChecker 的子类
+    :param optimizer_class: 运输方案优化器，TransportationOptimizer 的子类
+    :param warm_start:      是否用上一个问题的最优基热启动
+    :return: 依次 yield 各个问题的 TransportationResult
+    """
+    index = costs if isinstance(costs, CostIndex) else CostIndex(costs)
+    basis = None
+    for supply, demand in scenarios:
+        problem = TransportationProblem(supply, demand, index)
+        result = problem.solve(initer_class, checker_class, optimizer_class, warm_start=basis)
+        if warm_start:
+            basis = result.basis
+        yield result
+
+
+# Tests
+def _solve_batch_test():
+    ct = [[6, 7, 5, 3], [8, 4, 2, 7], [5, 9, 10, 6]]
+    scenarios = [
+        ([('A1', 14), ('A2', 27), ('A3', 19)], [('B1', 22), ('B2', 13), ('B3', 12), ('B4', 13)]),
+        ([('A1', 15), ('A2', 27), ('A3', 19)], [('B1', 23), ('B2', 13), ('B3', 12), ('B4', 13)]),
+        ([('A1', 30), ('A2', 5), ('A3', 5)], [('B1', 10), ('B2', 10), ('B3', 10), ('B4', 10)]),
+    ]
+    results = list(solve_batch(ct, scenarios))
+    for (sp, dm), r in zip(scenarios, results):
+        assert r.total_cost == TransportationProblem(sp, dm, ct).solve(checker_class=SpanningTreePotentialChecker).total_cost
+    assert results[0].total_cost == 232.0
+
+    # 产销平衡的情况在问题之间变化：热启动的基要添加或去掉虚拟的产地、销地
+    scenarios = [
+        ([('A1', 20), ('A2', 27), ('A3', 19)], [('B1', 22), ('B2', 13), ('B3', 12), ('B4', 13)]),
+        ([('A1', 14), ('A2', 27), ('A3', 19)], [('B1', 22), ('B2', 13), ('B3', 12), ('B4', 13)]),
+        ([('A1', 14), ('A2', 20), ('A3', 19)], [('B1', 22), ('B2', 13), ('B3', 12), ('B4', 13)]),
+        ([('A1', 30), ('A2', 27), ('A3', 19)], [('B1', 22), ('B2', 13), ('B3', 12), ('B4', 13)]),
+    ]
+    for (sp, dm), r in zip(scenarios, solve_batch(ct, scenarios)):
+        assert r.total_cost == TransportationProblem(sp, dm, ct).solve(checker_class=SpanningTreePotentialChecker).total_cost
+    print("solve_batch_test pass")
+
+
+if __name__ == '__main__':
+    _solve_batch_test()
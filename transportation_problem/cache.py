@@ -0,0 +1,286 @@
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from transportation_problem.problem import TransportationProblem, TransportationResult
+from transportation_problem.lanes import SparseCosts
+from transportation_problem.core import CostIndex
+
+
+class SolveCache(object):
+    """
+    SolveCache 求解结果缓存：产量、销量、运价与求解参数都相同的问题，直接返回之前的求解结果
+
+    键为产量、销量、运价数组内容的 blake2b 摘要，加上初始化、检验、优化等求解参数(类按模块与名称区分)；
+    产地、销地的名称不参与计算，命中时结果会换成当前问题的名称。
+    callback 与 warm_start 不参与计算：命中时不会调用 callback。
+    因 max_iter、time_limit、gap 提前停止的结果与热启动的基有关，只缓存、只返回没有热启动时求得的这种结果。
+
+    内存中按最近最少使用(LRU)淘汰，超过 maxsize 个或存放超过 ttl 秒的结果会被丢弃。
+    给定 directory 时，结果(有运量的格子、状态与下界，不含 basis 与 stats)同时以 .npz 文件保存在这个目录中，
+    内存中没有时从磁盘读取，可在进程之间、重启之后共享。
+
+    未命中时，若之前求解过规模与求解参数都相同、只是数据不同的问题(近似命中)，
+    就用那个问题的最优基热启动(见 TransportationProblem.solve 的 warm_start)。
+
+    属性：
+        - hits: 命中次数(含从磁盘读取)
+        - misses: 未命中次数
+        - near_hits: 未命中但用缓存的基热启动的次数
+    """
+
+    def __init__(self, maxsize=128, ttl=None, directory=None, near_hits=True):
+        """
+        :param maxsize:   内存中最多保存的结果个数
+        :param ttl:       结果的有效期(秒)，None 为不过期
+        :param directory: 磁盘缓存的目录，None 为只缓存在内存中
+        :param near_hits: 未命中时是否用同规模问题的最优基热启动
+        """
+        super().__init__()
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.directory = directory
+        self.use_near_hits = near_hits
+        self.hits = 0
+        self.misses = 0
+        self.near_hits = 0
+        self._results = OrderedDict()  # 键 -> (过期时刻, TransportationResult)
+        self._bases = OrderedDict()  # (规模, 产销差的符号, 求解参数) -> TransportationBasis
+        self._lock = threading.Lock()
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def solve(self, problem: TransportationProblem, **options) -> TransportationResult:
+        """
+        求解运输问题，有缓存的结果时直接返回
+        :param problem: TransportationProblem
+        :param options: TransportationProblem.solve 的参数
+        :return: TransportationResult
+        """
+        key = self.fingerprint(problem, options)
+        result = self.get(key, problem, options)
+        if result is not None:
+            return result
+
+        near = (len(problem.supply), len(problem.demand), np.sign(problem._imbalance()), _options_key(options))
+        with self._lock:
+            self.misses += 1
+            basis = self._bases.get(near) if self.use_near_hits and options.get('warm_start') is None else None
+            if basis is not None:
+                self.near_hits += 1
+        if basis is not None:
+            options = dict(options, warm_start=basis)
+        result = problem.solve(**options)
+        if _reusable(result, options):
+            self.put(key, result)
+        if result.basis is not None:
+            with self._lock:
+                self._bases[near] = result.basis
+                self._bases.move_to_end(near)
+                while len(self._bases) > self.maxsize:
+                    self._bases.popitem(last=False)
+        return result
+
+    @staticmethod
+    def fingerprint(problem: TransportationProblem, options=None) -> str:
+        """
+        问题数据与求解参数的摘要。数值都先转为 float64，整数与浮点数表示的相同数据得到相同的摘要
+        :param problem: TransportationProblem
+        :param options: TransportationProblem.solve 的参数
+        :return: 十六进制字符串
+        """
+        h = hashlib.blake2b(digest_size=20)
+        costs = problem.costs
+        if isinstance(costs, SparseCosts):
+            arrays = (costs.rows.astype(np.int64), costs.cols.astype(np.int64), costs.costs.astype(np.float64))
+            h.update(f'sparse{costs.shape}'.encode())
+        else:
+            arrays = (np.asarray(costs.costs if isinstance(costs, CostIndex) else costs, dtype=np.float64),)
+        arrays = (np.array([i[1] for i in problem.supply], dtype=np.float64),
+                  np.array([i[1] for i in problem.demand], dtype=np.float64)) + arrays
+        for a in arrays:
+            a = np.ascontiguousarray(a)
+            h.update(f'{a.dtype.str}{a.shape}'.encode())
+            h.update(a.data)
+        h.update(_options_key(options or {}).encode())
+        return h.hexdigest()
+
+    def get(self, key, problem: TransportationProblem, options=None):
+        """
+        :param key: fingerprint 得到的键
+        :param problem: 结果所属的问题
+        :param options: 这次求解的参数；热启动时不返回提前停止的结果
+        :return: 缓存的 TransportationResult，没有、已过期或不能用于这次求解时为 None
+        """
+        options = options or {}
+        with self._lock:
+            entry = self._results.get(key)
+            if entry is not None and entry[0] is not None and entry[0] < time.monotonic():
+                del self._results[key]
+                entry = None
+            if entry is not None and not _reusable(entry[1], options):
+                return None
+            if entry is not None:
+                self._results.move_to_end(key)
+                self.hits += 1
+        if entry is not None:
+            return _rebind(entry[1], problem)
+        result = self._load(key, problem)
+        if result is not None and not _reusable(result, options):
+            return None
+        if result is not None:
+            self._remember(key, result)
+            with self._lock:
+                self.hits += 1
+        return result
+
+    def put(self, key, result: TransportationResult):
+        """
+        保存求解结果
+        """
+        self._remember(key, result)
+        if self.directory is not None:
+            lower_bound = np.nan if result.lower_bound is None else result.lower_bound
+            # 写到唯一的临时文件再改名：别的进程不会读到写了一半的文件，同时写同一个键也不会互相覆盖临时文件
+            fd, temporary = tempfile.mkstemp(suffix='.tmp.npz', dir=self.directory)
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    np.savez(f, rows=result.rows, cols=result.cols, quantities=result.quantities,
+                             status=np.array(result.status), lower_bound=np.array(lower_bound))
+                os.replace(temporary, self._path(key))
+            except BaseException:
+                os.remove(temporary)
+                raise
+
+    def clear(self):
+        """
+        清空内存与磁盘中的缓存
+        """
+        with self._lock:
+            self._results.clear()
+            self._bases.clear()
+        if self.directory is not None:
+            for name in os.listdir(self.directory):
+                if name.endswith('.npz'):
+                    os.remove(os.path.join(self.directory, name))
+
+    def __len__(self):
+        return len(self._results)
+
+    def _remember(self, key, result):
+        expires = None if self.ttl is None else time.monotonic() + self.ttl
+        with self._lock:
+            self._results[key] = (expires, result)
+            self._results.move_to_end(key)
+            while len(self._results) > self.maxsize:
+                self._results.popitem(last=False)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f'{key}.npz')
+
+    def _load(self, key, problem):
+        if self.directory is None:
+            return None
+        path = self._path(key)
+        try:
+            if self.ttl is not None and os.path.getmtime(path) + self.ttl < time.time():
+                os.remove(path)
+                return None
+            with np.load(path) as data:
+                result = TransportationResult.from_cells(problem, data['rows'], data['cols'], data['quantities'],
+                                                         status=str(data['status']))
+                if 'lower_bound' in data.files and not np.isnan(data['lower_bound']):
+                    result.lower_bound = float(data['lower_bound'])
+                return result
+        except (FileNotFoundError, OSError, ValueError, KeyError):  # 没有、已被删除或已损坏的缓存文件
+            return None
+
+
+def _rebind(result: TransportationResult, problem: TransportationProblem) -> TransportationResult:
+    """
+    把数据相同的另一个问题的结果换成 problem 的结果(产地、销地名称可能不同)，运量数组共用
+    """
+    if result.problem is problem:
+        return result
+    rebound = TransportationResult.from_cells(problem, result.rows, result.cols, result.quantities, result.basis,
+                                              result.stats, None, result.status)
+    rebound.lower_bound = result.lower_bound
+    return rebound
+
+
+def _reusable(result: TransportationResult, options) -> bool:
+    """
+    结果能否缓存或从缓存返回：最优解总可以；提前停止的方案只用于没有热启动的求解
+    """
+    return result.status == 'optimal' or options.get('warm_start') is None
+
+
+def _options_key(options) -> str:
+    """
+    求解参数的字符串表示，类用 模块.名称 表示
+    """
+    items = []
+    for name, value in sorted(options.items()):
+        if name in ('callback', 'warm_start'):
+            continue
+        if isinstance(value, type):
+            value = f'{value.__module__}.{value.__qualname__}'
+        elif name == 'dtype' and value is not None:
+            value = np.dtype(value).str
+        items.append(f'{name}={value!r}')
+    return ','.join(items)
+
+
+# Tests
+def _solve_cache_test():
+    from transportation_problem.initer import NorthwestCornerIniter
+    from transportation_problem.checker import SpanningTreePotentialChecker
+
+    sp = [('A1', 14), ('A2', 27), ('A3', 19)]
+    dm = [('B1', 22), ('B2', 13), ('B3', 12), ('B4', 13)]
+    ct = [[6, 7, 5, 3], [8, 4, 2, 7], [5, 9, 10, 6]]
+    cache = SolveCache(maxsize=2)
+    r1 = cache.solve(TransportationProblem(sp, dm, ct), checker_class=SpanningTreePotentialChecker)
+    r2 = cache.solve(TransportationProblem([('X', 14.0), ('Y', 27.0), ('Z', 19.0)], dm, np.array(ct, dtype=float)),
+                     checker_class=SpanningTreePotentialChecker)
+    assert (cache.hits, cache.misses) == (1, 1) and r2.total_cost == r1.total_cost == 232
+    assert r2.problem.supply[0][0] == 'X'
+    cache.solve(TransportationProblem(sp, dm, ct))  # 求解参数不同
+    assert cache.misses == 2
+
+    # 近似命中：同规模、运价略有不同，用缓存的基热启动
+    ct2 = [[6, 7, 5, 3], [8, 4, 3, 7], [5, 9, 10, 6]]
+    r3 = cache.solve(TransportationProblem(sp, dm, ct2), checker_class=SpanningTreePotentialChecker)
+    assert cache.near_hits == 1 and r3.total_cost == TransportationProblem(sp, dm, ct2).solve().total_cost
+    assert len(cache) == 2
+
+    with tempfile.TemporaryDirectory() as d:
+        SolveCache(directory=d).solve(TransportationProblem(sp, dm, ct))
+        other = SolveCache(directory=d)
+        r4 = other.solve(TransportationProblem(sp, dm, ct))
+        assert other.hits == 1 and r4.total_cost == 232 and r4.basis is None
+        # 提前停止的结果连同下界一起保存
+        options = dict(initer_class=NorthwestCornerIniter, checker_class=SpanningTreePotentialChecker, max_iter=1)
+        r5 = SolveCache(directory=d).solve(TransportationProblem(sp, dm, ct), **options)
+        r6 = SolveCache(directory=d).solve(TransportationProblem(sp, dm, ct), **options)
+        assert r6.status == 'iteration_limit' and r6.lower_bound == r5.lower_bound and r6.gap == r5.gap > 0
+        # 热启动时不使用、也不保存提前停止的结果
+        warm = SolveCache(directory=d)
+        r7 = warm.solve(TransportationProblem(sp, dm, ct), warm_start=r1, **options)
+        assert (warm.hits, warm.misses) == (0, 1) and r7.status == 'optimal' and r7.total_cost == 232
+        assert not [name for name in os.listdir(d) if name.endswith('.tmp.npz')]
+
+    expiring = SolveCache(ttl=0)
+    expiring.solve(TransportationProblem(sp, dm, ct))
+    expiring.solve(TransportationProblem(sp, dm, ct))
+    assert expiring.hits == 0
+    print("solve_cache_test pass")
+
+
+if __name__ == '__main__':
+    _solve_cache_test()
@@ -1,18 +1,34 @@
 import numpy as np
+from transportation_problem.basis import TransportationBasis
+from transportation_problem.core import CostIndex
+from transportation_problem.pricing import TransportationPricing
 
 
 class TransportationChecker(object):
     """
     TransportationChecker 负责求检验数，并判断是否达到最优
+
+    accepts_basis 为 True 的检验器还可以直接检验 TransportationBasis
+
+    costs 可以是 CostIndex，这样运价表不会被复制，由各组件共用
     """
 
+    accepts_basis = False
+
     def __init__(self, supply: list, demand: list, costs: list):
         super().__init__()
         self.supply = [i[1] for i in supply]
         self.demand = [i[1] for i in demand]
-        self.costs = np.array(costs)
+        self.index = costs if isinstance(costs, CostIndex) else CostIndex(costs)
         self.transportation = np.array([])
-        self.sigma = np.ones(self.costs.shape) * np.nan  # 检验数，nan 表示基变量，不需要算检验数
+        self.sigma = np.ones(self.index.shape) * np.nan  # 检验数，nan 表示基变量，不需要算检验数
+
+    @property
+    def costs(self) -> np.ndarray:
+        """
+        完整的运价表(见 CostIndex.costs)，各检验器用 self.index 取运价，不补齐虚拟的行、列
+        """
+        return self.index.costs
 
     def check(self, transportation: list) -> (list, bool):
         """
@@ -20,7 +36,7 @@ class TransportationChecker(object):
         :return: 检验数，是否达到最优
         """
         self.transportation = np.array(transportation)
-        self.sigma = np.ones(self.costs.shape) * np.nan     # 重置检验数！
+        self.sigma = np.ones(self.index.shape) * np.nan     # 重置检验数！
         self._calc_sigma()
         return self.sigma, self._is_best()
 
@@ -65,18 +81,69 @@ class PotentialChecker(TransportationChecker):
         v = np.ones(np.array(self.demand).shape) * np.nan
         # 对基变量：$\sigma_{ij} = c_{ij} - (u_i + v_j) = 0$，求出 u 和 v
         while np.any(np.isnan(u)) or np.any(np.isnan(v)):
+            if not self._has_progress(u, v):
+                # 退化：基变量不足以求出所有位势，补一个运量为 0 的基变量，把已求出位势的部分与其余部分连起来
+                r_idx, c_idx = np.argwhere(np.isnan(u)[:, None] != np.isnan(v)[None, :])[0]
+                self.transportation[r_idx][c_idx] = 0
             for r_idx, row in enumerate(self.transportation):
                 for c_idx, element in enumerate(row):
                     if not np.isnan(element):  # 基
                         if (not np.isnan(u[r_idx])) and np.isnan(v[c_idx]):
-                            v[c_idx] = self.costs[r_idx][c_idx] - u[r_idx]
+                            v[c_idx] = self.index.cost(r_idx, c_idx) - u[r_idx]
                         elif (not np.isnan(v[c_idx])) and np.isnan(u[r_idx]):
-                            u[r_idx] = self.costs[r_idx][c_idx] - v[c_idx]
+                            u[r_idx] = self.index.cost(r_idx, c_idx) - v[c_idx]
         # 计算非基变量检验数: $\sigma_{ij} = c_{ij} - (u_i + v_j)$
         for r_idx, row in enumerate(self.transportation):
             for c_idx, element in enumerate(row):
                 if np.isnan(element):  # 非基
-                    self.sigma[r_idx][c_idx] = self.costs[r_idx][c_idx] - u[r_idx] - v[c_idx]
+                    self.sigma[r_idx][c_idx] = self.index.cost(r_idx, c_idx) - u[r_idx] - v[c_idx]
+
+    def _has_progress(self, u, v) -> bool:
+        """
+        是否还有基变量恰好连着一个已求出的位势与一个未求出的位势，即下一轮还能求出新的位势
+        """
+        basic = ~np.isnan(np.array(self.transportation, dtype=float))
+        return bool(np.any(basic & (np.isnan(u)[:, None] != np.isnan(v)[None, :])))
+
+
+class SpanningTreePotentialChecker(TransportationChecker):
+    """
+    位势法（生成树）
+
+    基变量构成一棵连接 产地 与 销地 的生成树，
+    在树上遍历一次即可求出所有位势，再一次向量化运算得到全部检验数。
+    检验 TransportationBasis 时直接使用其中随换基增量更新的位势，不再重算。
+
+    给定定价规则 pricing_class (TransportationPricing 的子类) 时，检验 TransportationBasis
+    只计算定价规则需要的检验数，返回 PricedCells 而不是完整的检验数矩阵。
+    """
+
+    accepts_basis = True
+
+    def __init__(self, supply: list, demand: list, costs: list, pricing_class=None):
+        super().__init__(supply, demand, costs)
+        self.basis = None
+        self.pricing = None
+        if pricing_class is not None:
+            assert issubclass(pricing_class, TransportationPricing)
+            self.pricing = pricing_class()
+
+    def check(self, transportation) -> (list, bool):
+        if isinstance(transportation, TransportationBasis):
+            self.basis = transportation
+            if self.pricing is not None:
+                self.sigma = self.pricing.price(self.basis)
+                return self.sigma, len(self.sigma.sigma) == 0
+            self.sigma = self.basis.sigma()
+            return self.sigma, self._is_best()
+        return super().check(transportation)
+
+    def _calc_sigma(self):
+        """
+        位势法计算检验数: $\\sigma_{ij} = c_{ij} - (u_i + v_j)$，生成树上的基变量检验数为 nan
+        """
+        self.basis = TransportationBasis(self.transportation, self.index)
+        self.sigma = self.basis.sigma()
 
 
 # Tests
@@ -85,9 +152,23 @@ def _potential_checker_test():
     dm = [('B1', 22), ('B2', 13), ('B3', 12), ('B4', 13)]
     ct = [[6, 7, 5, 3], [8, 4, 2, 7], [5, 9, 10, 6]]
     ts = [[1.0, 0.0, 0.0, 13.0], [2.0, 13.0, 12.0, 0.0], [19.0, 0.0, 0.0, 0.0]]
-    checker = PotentialChecker(sp, dm, ct, ts)
-    print(checker.check())
+    checker = PotentialChecker(sp, dm, ct)
+    print(checker.check(ts))
+
+
+def _spanning_tree_potential_checker_test():
+    sp = [('A1', 7), ('A2', 4), ('A3', 9)]
+    dm = [('B1', 3), ('B2', 6), ('B3', 5), ('B4', 6)]
+    ct = [[3, 11, 3, 10], [1, 9, 2, 8], [7, 4, 10, 5]]
+    ts = [[np.nan, np.nan, 5, 2], [3, np.nan, np.nan, 1], [np.nan, 6, np.nan, 3]]
+    sigma, is_best = SpanningTreePotentialChecker(sp, dm, ct).check(ts)
+    expected, _ = PotentialChecker(sp, dm, ct).check(ts)
+    assert np.array_equal(np.isnan(sigma), np.isnan(expected)), sigma
+    assert np.allclose(np.nan_to_num(sigma), np.nan_to_num(expected)), sigma
+    assert is_best
+    print("spanning_tree_potential_checker_test pass")
 
 
 if __name__ == '__main__':
     _potential_checker_test()
+    _spanning_tree_potential_checker_test()
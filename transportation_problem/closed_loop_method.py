@@ -1,3 +1,5 @@
+from collections import deque
+
 import numpy as np
 
 
@@ -102,6 +104,58 @@ class ClosedLoopMethod(object):
         return self.loop[:-1]
 
 
+class TreeClosedLoopMethod(object):
+    """
+    闭回路法（生成树），提供找闭回路的方法
+
+    基变量构成连接 产地(行节点 0..m-1) 与 销地(列节点 m..m+n-1) 的生成树，
+    从非基变量 (r, c) 出发的闭回路就是树上 列节点 c 到 行节点 r 的唯一路径。
+    用预先建好的邻接表迭代地做一次广度优先搜索即可找到，不需要递归回溯。
+    """
+
+    def __init__(self, sigma):
+        sigma = np.asarray(sigma)
+        self.shape = sigma.shape
+        m, n = self.shape
+        # 邻接表(CSR)：节点 x 的邻居为 neighbors[offsets[x]:offsets[x + 1]]
+        rs, cs = np.nonzero(np.isnan(sigma))
+        tails = np.concatenate([rs, m + cs])
+        heads = np.concatenate([m + cs, rs])
+        order = np.argsort(tails, kind='stable')
+        self.neighbors = heads[order].tolist()
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(tails, minlength=m + n))]).tolist()
+
+    def get_closed_loop(self, r, c) -> (np.ndarray, np.ndarray):
+        """
+        找闭回路
+        :param r: 起点行索引
+        :param c: 起点列索引
+        :return: 闭回路 (rows, cols)，闭回路上依次各点的行、列索引，下标 0 为 (r, c)
+        """
+        m = self.shape[0]
+        start, target = m + c, r
+        parent = {start: -1}
+        queue = deque([start])
+        while queue and target not in parent:
+            x = queue.popleft()
+            for y in self.neighbors[self.offsets[x]:self.offsets[x + 1]]:
+                if y not in parent:
+                    parent[y] = x
+                    queue.append(y)
+        if target not in parent:
+            raise RuntimeError(f'no closed loop from ({r}, {c})')
+
+        rows, cols = [r], [c]
+        x = target
+        while parent[x] != -1:  # 沿着父节点从 行节点 r 走回 列节点 c
+            y = parent[x]
+            rows.append(min(x, y))
+            cols.append(max(x, y) - m)
+            x = y
+        # 从 (r, c) 出发应先走到同一列上的格子，所以把 (r, c) 之后的部分倒过来
+        return np.array(rows[:1] + rows[:0:-1]), np.array(cols[:1] + cols[:0:-1])
+
+
 # Tests
 def _closed_loop_test():
     sg = [[np.nan, np.nan, np.nan, 3], [3, 4, np.nan, 5], [-1, np.nan, 0, np.nan]]
@@ -111,5 +165,14 @@ def _closed_loop_test():
     print('\n')
 
 
+def _tree_closed_loop_test():
+    sg = [[np.nan, np.nan, np.nan, 3], [3, 4, np.nan, 5], [-1, np.nan, 0, np.nan]]
+    rows, cols = TreeClosedLoopMethod(sg).get_closed_loop(2, 0)
+    expected = [(n.row_idx, n.col_idx) for n in ClosedLoopMethod(sg).get_closed_loop(2, 0)]
+    assert list(zip(rows.tolist(), cols.tolist())) == expected, (rows, cols)
+    print("tree_closed_loop_test pass")
+
+
 if __name__ == "__main__":
     _closed_loop_test()
+    _tree_closed_loop_test()
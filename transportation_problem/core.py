@@ -0,0 +1,231 @@
+from functools import cached_property
+
+import numpy as np
+
+
+class CostIndex(object):
+    """
+    CostIndex 运价表及其预处理结果，预处理按需计算并缓存，可在多次求解之间共享
+
+    solve() 每次只构造一个 CostIndex，交给初始化器、检验器、优化器与 TransportationBasis 共用，
+    各组件用 lookup、take_rows、reduced 等方法取运价，不再各自复制。
+
+    产销不平衡时，虚拟的产地(dummy='row')或销地(dummy='col')是在运价表最后虚拟地添加的一行(列)运价为 0 的格子：
+    不复制、不补齐原来的运价表，各方法把它当作运价为 0 的一行(列)处理。
+
+    属性：
+        - base: 原来的运价, 只读的、行优先连续存放的 ndarray，不含虚拟的行、列
+        - dummy: None、'row' 或 'col'
+        - shape: 含虚拟的行、列在内的形状
+        - costs: 运价, 只读的 m×n ndarray；有虚拟的行、列时第一次访问才补齐(复制一次)，各组件应尽量不用它
+        - flat_order: 所有格子按运价从小到大(稳定排序)的展平下标，最小元素法使用
+        - row_order: 各行按运价从小到大(稳定排序)的列索引，伏格尔法使用
+        - col_order: 各列按运价从小到大(稳定排序)的行索引，伏格尔法使用
+        - row_min, col_min: 各行、各列的最低运价，定价时用来跳过不可能有负检验数的行、列
+        - finite: 各格子的运价是否有限, bool ndarray；运价为 inf 的格子是不可用的线路
+    """
+
+    def __init__(self, costs, copy=True, dummy=None):
+        """
+        :param costs: 运价
+        :param copy: 为 False 时不复制已经是连续 ndarray 的运价(调用者不能再修改它)
+        :param dummy: 'row' 或 'col' 时在最后虚拟地添加一行(列)运价为 0 的格子
+        """
+        super().__init__()
+        if dummy not in (None, 'row', 'col'):
+            raise ValueError(f'unknown dummy line: {dummy}')
+        self.base = np.array(costs, order='C') if copy else np.ascontiguousarray(costs)
+        self.base.flags.writeable = False
+        self.dummy = dummy
+        m, n = self.base.shape
+        self.shape = (m + (dummy == 'row'), n + (dummy == 'col'))
+        if dummy is None:
+            self.costs = self.base
+
+    @cached_property
+    def costs(self) -> np.ndarray:
+        costs = np.pad(self.base, ((0, 1), (0, 0)) if self.dummy == 'row' else ((0, 0), (0, 1)))
+        costs.flags.writeable = False
+        return costs
+
+    def with_base(self, base):
+        """
+        :param base: 新的运价(不含虚拟的行、列)，不复制
+        :return: 虚拟的行、列与自己相同的 CostIndex
+        """
+        return CostIndex(base, copy=False, dummy=self.dummy)
+
+    def same_costs(self, other) -> bool:
+        """
+        :return: 两个 CostIndex 的运价(含虚拟的行、列)是否相同
+        """
+        if self is other:
+            return True
+        if self.shape != other.shape:
+            return False
+        if self.dummy == other.dummy:
+            return np.array_equal(self.base, other.base)
+        return np.array_equal(self.costs, other.costs)
+
+    def cost(self, r, c):
+        """
+        :return: 格子 (r, c) 的运价
+        """
+        m, n = self.base.shape
+        return self.base[r, c] if r < m and c < n else self.base.dtype.type(0)
+
+    def lookup(self, rows, cols) -> np.ndarray:
+        """
+        :param rows, cols: 格子的行、列索引
+        :return: 这些格子的运价
+        """
+        if self.dummy is None:
+            return self.base[rows, cols]
+        rows, cols = np.broadcast_arrays(np.asarray(rows), np.asarray(cols))
+        m, n = self.base.shape
+        real = (rows < m) & (cols < n)
+        costs = np.zeros(rows.shape, dtype=self.base.dtype)
+        costs[real] = self.base[rows[real], cols[real]]
+        return costs
+
+    def take_rows(self, rows) -> np.ndarray:
+        """
+        :return: rows 这些行的运价, len(rows)×n ndarray (即 costs[rows])
+        """
+        if self.dummy is None:
+            return self.base[rows]
+        rows = np.asarray(rows)
+        costs = np.zeros((len(rows), self.shape[1]), dtype=self.base.dtype)
+        real = rows < self.base.shape[0]
+        costs[real, :self.base.shape[1]] = self.base[rows[real]]
+        return costs
+
+    def take_cols(self, cols) -> np.ndarray:
+        """
+        :return: cols 这些列的运价, m×len(cols) ndarray (即 costs[:, cols])
+        """
+        if self.dummy is None:
+            return self.base[:, cols]
+        cols = np.asarray(cols)
+        costs = np.zeros((self.shape[0], len(cols)), dtype=self.base.dtype)
+        real = cols < self.base.shape[1]
+        costs[:self.base.shape[0], real] = self.base[:, cols[real]]
+        return costs
+
+    def reduced(self, u, v) -> np.ndarray:
+        """
+        :param u, v: 各行、各列的位势
+        :return: $c_{ij} - u_i - v_j$, m×n ndarray
+        """
+        if self.dummy is None:
+            return self.base - u[:, None] - v[None, :]
+        m, n = self.base.shape
+        reduced = np.empty(self.shape, dtype=np.result_type(self.base, u, v))
+        np.subtract(self.base, u[:m, None], out=reduced[:m, :n])
+        reduced[:m, :n] -= v[None, :n]
+        if self.dummy == 'row':
+            reduced[m, :] = -u[m] - v
+        else:
+            reduced[:, n] = -u - v[n]
+        return reduced
+
+    def total(self, transportation) -> float:
+        """
+        :param transportation: m×n 运量表，nan 当作 0
+        :return: 总运价
+        """
+        m, n = self.base.shape
+        return np.nansum(np.asarray(transportation)[:m, :n] * self.base)
+
+    @cached_property
+    def flat_order(self) -> np.ndarray:
+        order = np.argsort(self.base, axis=None, kind='stable')
+        if self.dummy is None:
+            return order
+        m, n = self.shape
+        values = self.base.ravel()[order]
+        if self.dummy == 'col':  # 补上虚拟列后，(i, j) 的展平下标从 i*(n-1)+j 变为 i*n+j
+            order = order + order // (n - 1)
+            line = np.arange(m) * n + n - 1
+        else:
+            line = np.arange((m - 1) * n, m * n)
+        # 虚拟的格子运价为 0，和运价为 0 的格子一起按展平下标排序
+        lo, hi = np.searchsorted(values, 0, 'left'), np.searchsorted(values, 0, 'right')
+        return np.concatenate([order[:lo], np.sort(np.concatenate([order[lo:hi], line])), order[hi:]])
+
+    @cached_property
+    def row_order(self) -> np.ndarray:
+        return _line_order(self.base, self.dummy == 'col', self.dummy == 'row')
+
+    @cached_property
+    def col_order(self) -> np.ndarray:
+        return _line_order(self.base.T, self.dummy == 'row', self.dummy == 'col')
+
+    @cached_property
+    def row_min(self) -> np.ndarray:
+        return _line_min(self.base.min(axis=1), self.dummy == 'col', self.dummy == 'row')
+
+    @cached_property
+    def col_min(self) -> np.ndarray:
+        return _line_min(self.base.min(axis=0), self.dummy == 'row', self.dummy == 'col')
+
+    @cached_property
+    def finite(self) -> np.ndarray:
+        finite = np.isfinite(self.base)
+        if self.dummy is None:
+            return finite
+        return np.pad(finite, ((0, 1), (0, 0)) if self.dummy == 'row' else ((0, 0), (0, 1)), constant_values=True)
+
+    def __array__(self, dtype=None, copy=None):
+        return self.costs if dtype is None else self.costs.astype(dtype)
+
+
+def _line_order(costs, dummy_item, dummy_line) -> np.ndarray:
+    """
+    costs 各行按运价从小到大(稳定排序)的下标
+    :param dummy_item: 各行最后还有一个虚拟的 0 (下标最大，排在所有 <= 0 的运价之后)
+    :param dummy_line: 最后还有一行虚拟的 0
+    """
+    order = np.argsort(costs, axis=1, kind='stable')
+    if dummy_item:
+        n = order.shape[1]
+        k = np.count_nonzero(costs <= 0, axis=1)[:, None]  # 虚拟的 0 在各行中的位置
+        j = np.arange(n + 1)[None, :]
+        shifted = np.take_along_axis(order, np.minimum(np.where(j > k, j - 1, j), n - 1), axis=1)
+        order = np.where(j == k, n, shifted)
+    if dummy_line:
+        order = np.vstack([order, np.arange(order.shape[1])])
+    return order
+
+
+def _line_min(mins, dummy_item, dummy_line) -> np.ndarray:
+    """
+    各行的最低运价，含虚拟的 0
+    """
+    if dummy_item:
+        return np.minimum(mins, 0)
+    if dummy_line:
+        return np.append(mins, 0)
+    return mins
+
+
+# Tests
+def _cost_index_dummy_test():
+    ct = np.array([[3, 0, -1, 10], [1, 9, 0, 8], [0, 4, 10, 5]])
+    for dummy, padded in (('col', np.pad(ct, ((0, 0), (0, 1)))), ('row', np.pad(ct, ((0, 1), (0, 0))))):
+        index, expected = CostIndex(ct, dummy=dummy), CostIndex(padded)
+        assert index.shape == padded.shape and 'costs' not in index.__dict__
+        for name in ('flat_order', 'row_order', 'col_order', 'row_min', 'col_min', 'finite'):
+            assert np.array_equal(getattr(index, name), getattr(expected, name)), name
+        u, v = np.arange(padded.shape[0]), np.arange(padded.shape[1]) * 2
+        assert np.array_equal(index.reduced(u, v), expected.reduced(u, v))
+        assert np.array_equal(index.take_rows([2, padded.shape[0] - 1]), padded[[2, -1]])
+        assert np.array_equal(index.take_cols([padded.shape[1] - 1, 0]), padded[:, [-1, 0]])
+        assert index.lookup([0, 2], [1, padded.shape[1] - 1]).tolist() == padded[[0, 2], [1, -1]].tolist()
+        assert index.total(np.ones(padded.shape)) == padded.sum() and 'costs' not in index.__dict__
+        assert index.same_costs(expected) and np.array_equal(index, padded)
+    print("cost_index_dummy_test pass")
+
+
+if __name__ == '__main__':
+    _cost_index_dummy_test()
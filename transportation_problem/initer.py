@@ -1,17 +1,29 @@
+import time
+
 import numpy as np
+from transportation_problem.core import CostIndex
 
 
 class TransportationIniter(object):
     """
     TransportationIniter 运输问题初始化的器
+
+    costs 可以是 CostIndex，这样运价的排序等预处理结果可以在多次求解之间共享
     """
 
     def __init__(self, supply: list, demand: list, costs: list):
         super().__init__()
         self.supply = [i[1] for i in supply]
         self.demand = [i[1] for i in demand]
-        self.costs = np.array(costs)
-        self.transportation = np.ones(self.costs.shape) * np.nan  # 运量表
+        self.index = costs if isinstance(costs, CostIndex) else CostIndex(costs)
+        self.transportation = np.ones(self.index.shape) * np.nan  # 运量表
+
+    @property
+    def costs(self) -> np.ndarray:
+        """
+        完整的运价表(见 CostIndex.costs)，各初始化方法用 self.index 取运价，不补齐虚拟的行、列
+        """
+        return self.index.costs
 
     def init(self) -> list:
         """
@@ -46,25 +58,36 @@ class TransportationIniter(object):
 class MinimumElementIniter(TransportationIniter):
     """
     最小元素法
+
+    给定 preferred (展平后的格子下标) 时，先按运价从小到大在这些格子上安排运量，再照常处理其余格子。
+    热启动时用它把之前的基变量尽量保留下来。
     """
 
-    def __init__(self, supply: list, demand: list, costs: list):
+    def __init__(self, supply: list, demand: list, costs: list, preferred=None):
         super().__init__(supply, demand, costs)
+        self.preferred = preferred
 
     def init(self) -> list:
-        # 将运价从小到大排序
-        sorted_costs = sorted([c for r in self.costs for c in r])
-        for min_element in sorted_costs:  # 从最小元素开始填运量
-            # 获取最小元素坐标
-            mint = np.where(self.costs == min_element)
-            min_indices = np.array(mint).T
-            # TAG_LOOP:
-            for index in min_indices:
-                if self.supply[index[0]] != 0 and self.demand[index[1]] != 0:  # 还没"划掉"
-                    self._arrange_transportation(index[0], index[1])
-                    break  # break TAG_LOOP
-            if not (np.any(self.supply) or np.any(self.demand)):  # 所有supply、demand值都为0
+        n = self.index.shape[1]
+        # 将运价从小到大排序(稳定排序：运价相同的按行优先顺序)，只排一次
+        order = self.index.flat_order
+        if self.preferred is not None:
+            preferred = np.asarray(self.preferred, dtype=int)
+            preferred = preferred[np.argsort(self.index.lookup(preferred // n, preferred % n), kind='stable')]
+            order = np.concatenate([preferred, order])
+        row_live = (np.array(self.supply) != 0).tolist()
+        col_live = (np.array(self.demand) != 0).tolist()
+        remaining = sum(row_live)  # 还没"划掉"的行数
+        for r, c in zip((order // n).tolist(), (order % n).tolist()):  # 从最小元素开始填运量
+            if remaining == 0:  # 所有supply都为0
                 break
+            if row_live[r] and col_live[c]:  # 还没"划掉"
+                self._arrange_transportation(r, c)
+                if self.supply[r] == 0:
+                    row_live[r] = False
+                    remaining -= 1
+                if self.demand[c] == 0:
+                    col_live[c] = False
 
         return list(self.transportation.tolist())
 
@@ -80,7 +103,8 @@ class NorthwestCornerIniter(TransportationIniter):
     def init(self) -> list:
         # transportation = np.zeros(self.costs.shape)  # 运量表
         r, c = 0, 0  # 从西北角，即 (r, c) = (0, 0) 开始处理，注意r对应supply，c对应demand
-        while (r, c) < self.costs.shape:
+        m, n = self.index.shape
+        while r < m and c < n:  # 末尾的产量或销量为 0 时，另一个索引可能先到头
             self._arrange_transportation(r, c)
             r += 1 if self.supply[r] == 0 else 0
             c += 1 if self.demand[c] == 0 else 0
@@ -91,103 +115,163 @@ class NorthwestCornerIniter(TransportationIniter):
 class VogelIniter(TransportationIniter):
     """
     伏格尔法
+
+    每行/列按运价从小到大排好序，用两个指针指向其中还没"划掉"的最低、次低运价，
+    差额保存在 row_diffs / col_diffs 数组中。每次安排运量后只更新指针落在被"划掉"的行/列上的那些差额。
     """
 
     def __init__(self, supply: list, demand: list, costs: list):
         super().__init__(supply, demand, costs)
 
     def init(self) -> list:
+        m, n = self.index.shape
+        row_order = self.index.row_order  # 各行运价从小到大的列索引
+        col_order = self.index.col_order  # 各列运价从小到大的行索引
+        row_live = np.array(self.supply) != 0
+        col_live = np.array(self.demand) != 0
+        row_ptr = np.zeros((m, 2), dtype=int)  # 行中最低、次低运价在 row_order 中的位置
+        col_ptr = np.zeros((n, 2), dtype=int)
+        row_diffs = np.full(m, -1.0)  # 产量、销量为 0 的行/列一开始就被"划掉"，差额为 -1
+        col_diffs = np.full(n, -1.0)
+        self._refresh_diffs(self._row_costs, row_order, row_ptr, row_live, col_live, row_diffs, np.arange(m))
+        self._refresh_diffs(self._col_costs, col_order, col_ptr, col_live, row_live, col_diffs, np.arange(n))
+
         while np.any(self.supply) or np.any(self.demand):  # 不是所有supply、demand值都为0
-            rd = self._get_row_diffs()
-            cd = self._get_col_diffs()
-            max_diff = max(rd + cd)
-            rs_max = np.where(np.array(rd) == max_diff)
-            cs_max = np.where(np.array(cd) == max_diff)
-
-            if len(rs_max) > 0 and len(rs_max[0]) > 0:  # 最差值在行
-                r_idx = rs_max[0][-1]
-                c_min = np.inf
-                c_idx = -1
-                for i, c in enumerate(self.costs[r_idx]):
-                    if self.demand[i] == 0:
-                        continue
-                    if c < c_min:
-                        c_min = c
-                        c_idx = i
-                if c_idx == -1:
+            max_diff = max(row_diffs.max(initial=-1), col_diffs.max(initial=-1))
+            rs_max = np.flatnonzero(row_diffs == max_diff)
+            if len(rs_max) > 0:  # 最差值在行，安排这一行里最低运价处的运量
+                r_idx = rs_max[-1]
+                if row_ptr[r_idx, 0] >= n:
                     raise RuntimeError
-                self._arrange_transportation(r_idx, c_idx)
-            elif len(cs_max) > 0 and len(cs_max[0]) > 0:  # 最差值在列
-                c_idx = cs_max[0][-1]
-                r_min = np.inf
-                r_idx = -1
-                for i, r in enumerate(self.costs.T[c_idx]):
-                    if self.supply[i] == 0:
-                        continue
-                    if r < r_min:
-                        r_min = r
-                        r_idx = i
-                if r_idx == -1:
+                c_idx = row_order[r_idx, row_ptr[r_idx, 0]]
+            else:  # 最差值在列
+                c_idx = np.flatnonzero(col_diffs == max_diff)[-1]
+                if col_ptr[c_idx, 0] >= m:
                     raise RuntimeError
-                self._arrange_transportation(r_idx, c_idx)
+                r_idx = col_order[c_idx, col_ptr[c_idx, 0]]
+            self._arrange_transportation(r_idx, c_idx)
+
+            # 只更新受"划掉"的行/列影响的差额
+            if self.supply[r_idx] == 0:
+                row_live[r_idx] = False
+                row_diffs[r_idx] = -1
+                self._refresh_diffs(self._col_costs, col_order, col_ptr, col_live, row_live, col_diffs,
+                                    self._lines_pointing_at(col_order, col_ptr, col_live, r_idx))
+            if self.demand[c_idx] == 0:
+                col_live[c_idx] = False
+                col_diffs[c_idx] = -1
+                self._refresh_diffs(self._row_costs, row_order, row_ptr, row_live, col_live, row_diffs,
+                                    self._lines_pointing_at(row_order, row_ptr, row_live, c_idx))
 
         return list(self.transportation.tolist())
 
-    def _get_row_diffs(self) -> list:
-        """
-        算行差额，若某行已经被"划掉"，则返回中对应的值为 -1
-        :return: list of diffs
-        """
-        return self._get_diffs_of_axis(self.costs, self.supply, self.demand)
+    def _row_costs(self, rows, cols) -> np.ndarray:
+        return self.index.lookup(rows, cols)
 
-    def _get_col_diffs(self) -> list:
+    def _col_costs(self, cols, rows) -> np.ndarray:
+        return self.index.lookup(rows, cols)
+
+    @staticmethod
+    def _lines_pointing_at(order, ptr, live, idx) -> np.ndarray:
         """
-        算列差额，若某列已经被"划掉"，则返回中对应的值为 -1
-        :return: list of diffs
+        找出最低或次低运价指针指向 idx 的那些没"划掉"的行/列
         """
-        return self._get_diffs_of_axis(self.costs.T, self.demand, self.supply)
-
-    def _get_diffs_of_axis(self, axis, source, resource) -> list:
+        k = order.shape[1]
+        lines = np.flatnonzero(live)
+        hit = np.zeros(len(lines), dtype=bool)
+        for j in (0, 1):
+            p = ptr[lines, j]
+            valid = p < k
+            hit[valid] |= order[lines[valid], p[valid]] == idx
+        return lines[hit]
+
+    @staticmethod
+    def _refresh_diffs(lookup, order, ptr, live, other_live, diffs, lines) -> None:
         """
-        算行/列差额，若某行/列已经被"划掉"，则返回中对应的值为 -1
-        (emmmm, 因为要抽象行和列的通用处理，所以参数设计的有点怪，我不想解释其含义，说起来麻烦。反正照下面的说明用就行了👇)
-        :param axis: 算列差额为 self.costs.T，算行差额为 self.costs
-        :param source: 算列差额为 self.demand，算行差额为 self.supply
-        :param resource: 算列差额为 self.supply，算行差额为 self.demand
-        :return: list of diffs
+        把 lines 这些行/列的最低、次低运价指针向后移到没"划掉"的位置上，并重算差额，**原址操作**
+        (和从前一样，为了同时处理行和列，参数有点怪👇)
+        :param lookup: 取运价的函数 lookup(行/列, 其中的下标)：算列差额为 self._col_costs，算行差额为 self._row_costs
+        :param order: 各行/列按运价从小到大排序的下标
+        :param ptr: 各行/列最低、次低运价在 order 中的位置
+        :param live: 各行/列是否还没"划掉"
+        :param other_live: 算列差额为 row_live，算行差额为 col_live
+        :param diffs: 差额，若某行/列已经被"划掉"，则为 -1
+        :param lines: 要更新的行/列
         """
-        diffs = []
-        for i, line in enumerate(axis):
-            if source[i] == 0:
-                diffs.append(-1)
+        k = order.shape[1]
+        lines = lines[live[lines]]
+        p = ptr[lines, 0]
+        for j in (0, 1):
+            if j == 1:
+                p = np.maximum(ptr[lines, 1], p + 1)
+            while True:  # 指针只会向后移，所以总的移动次数不超过 m*n
+                valid = np.flatnonzero(p < k)
+                dead = valid[~other_live[order[lines[valid], p[valid]]]]
+                if len(dead) == 0:
+                    break
+                p[dead] += 1
+            ptr[lines, j] = p
+
+        lowest = np.full(len(lines), np.inf)
+        second_lowest = np.full(len(lines), np.inf)
+        has_lowest = ptr[lines, 0] < k
+        has_second = ptr[lines, 1] < k
+        lowest[has_lowest] = lookup(lines[has_lowest], order[lines[has_lowest], ptr[lines[has_lowest], 0]])
+        second_lowest[has_second] = lookup(lines[has_second], order[lines[has_second], ptr[lines[has_second], 1]])
+        diffs[lines] = np.where(has_second, second_lowest - lowest, np.where(has_lowest, lowest, -1))
+
+
+class PortfolioIniter(TransportationIniter):
+    """
+    组合初始化：在当前线程中逐个(不是并发地)用若干种初始化方法求初始方案，取总运价最低的一个。
+    某个方法出错时跳过它，所有方法都出错时抛出第一个方法的异常。
+
+    initer_classes 为参与比较的初始化方法；time_budget 为时间预算(秒)，用完后不再尝试余下的方法
+    (至少会运行第一个)。可以通过构造参数或在子类中覆盖这两个类属性来定制。
+    """
+
+    initer_classes = (NorthwestCornerIniter, MinimumElementIniter, VogelIniter)
+    time_budget = None
+
+    def __init__(self, supply: list, demand: list, costs: list, initer_classes=None, time_budget=None):
+        super().__init__(supply, demand, costs)
+        self._problem = (supply, demand)
+        if initer_classes is not None:
+            self.initer_classes = initer_classes
+        if time_budget is not None:
+            self.time_budget = time_budget
+        self.chosen = None  # 选中的初始化方法
+
+    def init(self) -> list:
+        start = time.perf_counter()
+        best, best_cost, errors = None, np.inf, []
+        for initer_class in self.initer_classes:
+            if best is not None and self.time_budget is not None and time.perf_counter() - start > self.time_budget:
+                break
+            try:
+                transportation = initer_class(*self._problem, self.index).init()
+            except Exception as e:
+                errors.append(e)
                 continue
-            lowest, second_lowest = np.inf, np.inf
-            operated_flag = False
-            for j, element in enumerate(line):
-                if resource[j] == 0:
-                    continue
-                if element <= lowest:
-                    second_lowest = lowest
-                    lowest = element
-                    operated_flag = True
-                elif element <= second_lowest:
-                    second_lowest = element
-                    operated_flag = True
-            if second_lowest == np.inf:
-                diff = lowest
-            else:
-                diff = second_lowest - lowest
-            diffs.append(diff if operated_flag else -1)
-        return diffs
+            cost = self.index.total(np.array(transportation, dtype=float))
+            if best is None or cost < best_cost:
+                best, best_cost, self.chosen = transportation, cost, initer_class
+        if best is None:
+            raise errors[0]
+        return best
 
 
 # Tests
+nan = np.nan
+
+
 def __minimum_element_initer_test():
     sp = [('A1', 14), ('A2', 27), ('A3', 19)]
     dm = [('B1', 22), ('B2', 13), ('B3', 12), ('B4', 13)]
     ct = [[6, 7, 5, 3], [8, 4, 2, 7], [5, 9, 10, 6]]
     initer = MinimumElementIniter(sp, dm, ct)
-    assert initer.init() == [[1.0, 0.0, 0.0, 13.0], [2.0, 13.0, 12.0, 0.0], [19.0, 0.0, 0.0, 0.0]]
+    r = initer.init()
+    assert np.array_equal(r, [[1, nan, nan, 13], [2, 13, 12, nan], [19, nan, nan, nan]], equal_nan=True), str(r)
     print("minimum_element_initer_test pass")
 
 
@@ -196,7 +280,16 @@ def __northwest_corner_initer_test():
     dm = [('B1', 3), ('B2', 6), ('B3', 5), ('B4', 6)]
     ct = [[3, 11, 3, 10], [1, 9, 2, 8], [7, 4, 10, 5]]
     initer = NorthwestCornerIniter(sp, dm, ct)
-    assert initer.init() == [[3.0, 4.0, 0.0, 0.0], [0.0, 2.0, 2.0, 0.0], [0.0, 0.0, 3.0, 6.0]]
+    r = initer.init()
+    assert np.array_equal(r, [[3, 4, nan, nan], [nan, 2, 2, nan], [nan, nan, 3, 6]], equal_nan=True), str(r)
+
+    # 末尾的产量、销量为 0
+    sp = [('A1', 0), ('A2', 1), ('A3', 1), ('A4', 3), ('A5', 0)]
+    dm = [('B1', 2), ('B2', 3)]
+    r = NorthwestCornerIniter(sp, dm, np.ones((5, 2))).init()
+    assert np.array_equal(r, [[nan, nan], [1, nan], [1, nan], [nan, 3], [nan, nan]], equal_nan=True), str(r)
+    r = PortfolioIniter(sp, dm, np.ones((5, 2))).init()
+    assert np.nansum(r) == 5, str(r)
     print("northwest_corner_initer_test pass")
 
 
@@ -206,18 +299,101 @@ def __vogel_initer_test():
     ct = [[3, 11, 3, 10], [1, 9, 2, 8], [7, 4, 10, 5]]
     initer1 = VogelIniter(sp, dm, ct)
     r1 = initer1.init()
-    assert r1 == [[2.0, 0.0, 5.0, 0.0], [1.0, 0.0, 0.0, 3.0], [0.0, 6.0, 0.0, 3.0]], str(r1)
+    assert np.array_equal(r1, [[2, nan, 5, nan], [1, nan, nan, 3], [nan, 6, nan, 3]], equal_nan=True), str(r1)
 
     sp = [('A1', 14), ('A2', 27), ('A3', 19)]
     dm = [('B1', 22), ('B2', 13), ('B3', 12), ('B4', 13)]
     ct = [[6, 7, 5, 3], [8, 4, 2, 7], [5, 9, 10, 6]]
     initer2 = VogelIniter(sp, dm, ct)
     r2 = initer2.init()
-    assert r2 == [[1.0, 0.0, 0.0, 13.0], [2.0, 13.0, 12.0, 0.0], [19.0, 0.0, 0.0, 0.0]], str(r2)
+    assert np.array_equal(r2, [[1, nan, nan, 13], [2, 13, 12, nan], [19, nan, nan, nan]], equal_nan=True), str(r2)
+
+    # 产量、销量为 0 的行/列一开始就被"划掉"
+    sp = [('A1', 0), ('A2', 2), ('A3', 2)]
+    dm = [('B1', 2), ('B2', 0), ('B3', 0), ('B4', 1), ('B5', 1), ('B6', 0)]
+    ct = [[4, 1, 2, 7, 3, 1], [5, 2, 8, 3, 6, 1], [2, 9, 4, 6, 1, 3]]
+    for _ in range(3):
+        r3 = VogelIniter(sp, dm, ct).init()
+        expected = [[np.nan] * 6, [1, np.nan, np.nan, 1, np.nan, np.nan], [1, np.nan, np.nan, np.nan, 1, np.nan]]
+        assert np.array_equal(r3, expected, equal_nan=True), str(r3)
     print("vogel_initer_test pass")
 
 
+def __portfolio_initer_test():
+    sp = [('A1', 7), ('A2', 4), ('A3', 9)]
+    dm = [('B1', 3), ('B2', 6), ('B3', 5), ('B4', 6)]
+    ct = [[3, 11, 3, 10], [1, 9, 2, 8], [7, 4, 10, 5]]
+    initer = PortfolioIniter(sp, dm, ct)
+    r = initer.init()
+    assert initer.chosen is VogelIniter and np.array_equal(r, VogelIniter(sp, dm, ct).init(), equal_nan=True), str(r)
+    print("portfolio_initer_test pass")
+
+
+def __reference_minimum_element(supply, demand, costs):
+    """
+    逐个最小元素扫描整张运价表的最小元素法(排序一次之前的实现)，用来核对 MinimumElementIniter
+    """
+    initer = TransportationIniter(supply, demand, costs)
+    for min_element in sorted(initer.costs.flat):
+        for r, c in np.argwhere(initer.costs == min_element):  # 运价相同时按行优先顺序
+            if initer.supply[r] != 0 and initer.demand[c] != 0:
+                initer._arrange_transportation(r, c)
+                break
+    return initer.transportation.tolist()
+
+
+def __reference_vogel(supply, demand, costs):
+    """
+    每一步都重算全部差额的伏格尔法(向量化之前的实现)，用来核对 VogelIniter
+    """
+    initer = TransportationIniter(supply, demand, costs)
+
+    def diffs(axis, source, resource):
+        result = []
+        for i, line in enumerate(axis):
+            live = sorted(x for j, x in enumerate(line) if resource[j] != 0)
+            if source[i] == 0 or not live:
+                result.append(-1)
+            else:
+                result.append(live[1] - live[0] if len(live) > 1 else live[0])
+        return result
+
+    while np.any(initer.supply) or np.any(initer.demand):
+        rd = diffs(initer.costs, initer.supply, initer.demand)
+        cd = diffs(initer.costs.T, initer.demand, initer.supply)
+        max_diff = max(rd + cd)
+        if max_diff in rd:  # 差额相同时取最后一行(列)，行优先于列；行(列)中运价相同时取第一个
+            r = len(rd) - 1 - rd[::-1].index(max_diff)
+            c = min((x, j) for j, x in enumerate(initer.costs[r]) if initer.demand[j] != 0)[1]
+        else:
+            c = len(cd) - 1 - cd[::-1].index(max_diff)
+            r = min((x, i) for i, x in enumerate(initer.costs.T[c]) if initer.supply[i] != 0)[1]
+        initer._arrange_transportation(r, c)
+    return initer.transportation.tolist()
+
+
+def __tie_breaking_test():
+    # 运价取值很少，有大量相同的运价；产量、销量中有 0
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        m, n = rng.integers(1, 7, 2)
+        supply = rng.integers(0, 5, m)
+        demand = rng.multinomial(supply.sum(), np.ones(n) / n)
+        if supply.sum() == 0:
+            continue
+        sp = [(i, int(q)) for i, q in enumerate(supply)]
+        dm = [(j, int(q)) for j, q in enumerate(demand)]
+        ct = rng.integers(1, 4, (m, n)).tolist()
+        for initer_class, reference in ((MinimumElementIniter, __reference_minimum_element),
+                                        (VogelIniter, __reference_vogel)):
+            r, expected = initer_class(sp, dm, ct).init(), reference(sp, dm, ct)
+            assert np.array_equal(r, expected, equal_nan=True), (initer_class.__name__, sp, dm, ct)
+    print("tie_breaking_test pass")
+
+
 if __name__ == '__main__':
     __minimum_element_initer_test()
     __northwest_corner_initer_test()
     __vogel_initer_test()
+    __portfolio_initer_test()
+    __tie_breaking_test()
@@ -0,0 +1,97 @@
+import numpy as np
+
+
+class SparseCosts(object):
+    """
+    SparseCosts 稀疏运价表：只记录存在的线路 (产地, 销地, 运价)，不存在的线路不能运输
+
+    属性：
+        - rows, cols: 各条线路的产地、销地索引，按行优先顺序排好
+        - costs: 各条线路的运价
+        - shape: (产地数, 销地数)
+    """
+
+    def __init__(self, rows, cols, costs, shape):
+        super().__init__()
+        rows = np.asarray(rows, dtype=int).ravel()
+        cols = np.asarray(cols, dtype=int).ravel()
+        costs = np.asarray(costs).ravel()
+        if not len(rows) == len(cols) == len(costs):
+            raise ValueError('rows, cols and costs must have the same length')
+        m, n = shape
+        if len(rows) > 0 and (rows.min() < 0 or rows.max() >= m or cols.min() < 0 or cols.max() >= n):
+            raise ValueError(f'lane index out of range for shape {shape}')
+
+        flat = rows * n + cols
+        order = np.argsort(flat, kind='stable')
+        self._flat = flat[order]
+        if np.any(self._flat[1:] == self._flat[:-1]):
+            raise ValueError('duplicated lanes')
+        self.rows = rows[order]
+        self.cols = cols[order]
+        self.costs = costs[order]
+        self.shape = (m, n)
+
+    @classmethod
+    def from_triples(cls, triples, shape):
+        """
+        从 COO 三元组构造
+        :param triples: [(产地索引, 销地索引, 运价), ...]
+        :param shape: (产地数, 销地数)
+        """
+        triples = list(triples)
+        rows = [t[0] for t in triples]
+        cols = [t[1] for t in triples]
+        costs = [t[2] for t in triples]
+        return cls(rows, cols, costs, shape)
+
+    @classmethod
+    def from_scipy(cls, matrix):
+        """
+        从 scipy.sparse 风格的稀疏矩阵(有 tocoo() 方法)构造，显式存储的元素(包括 0)都是线路
+        """
+        coo = matrix.tocoo()
+        return cls(coo.row, coo.col, coo.data, coo.shape)
+
+    @property
+    def nnz(self) -> int:
+        """
+        线路条数
+        """
+        return len(self.costs)
+
+    def lookup(self, rows, cols) -> np.ndarray:
+        """
+        查 (rows[k], cols[k]) 处的运价，不存在的线路为 inf
+        """
+        flat = np.asarray(rows) * self.shape[1] + np.asarray(cols)
+        if self.nnz == 0:
+            return np.full(np.shape(flat), np.inf)
+        k = np.minimum(np.searchsorted(self._flat, flat), self.nnz - 1)
+        return np.where(self._flat[k] == flat, self.costs[k], np.inf)
+
+    def toarray(self, fill_value=np.inf) -> np.ndarray:
+        """
+        转为稠密的运价矩阵
+        :param fill_value: 不存在的线路处的运价
+        """
+        dense = np.full(self.shape, fill_value, dtype=np.result_type(self.costs, float))
+        dense[self.rows, self.cols] = self.costs
+        return dense
+
+    def __array__(self, dtype=None, copy=None):
+        dense = self.toarray()
+        return dense if dtype is None else dense.astype(dtype)
+
+
+# Tests
+def _sparse_costs_test():
+    lanes = SparseCosts.from_triples([(1, 2, 5), (0, 0, 3), (1, 0, 4)], (2, 3))
+    assert lanes.rows.tolist() == [0, 1, 1] and lanes.cols.tolist() == [0, 0, 2]
+    assert lanes.lookup([1, 0], [2, 1]).tolist() == [5, np.inf]
+    assert np.array_equal(np.array(lanes), [[3, np.inf, np.inf], [4, np.inf, 5]])
+    print("sparse_costs_test pass")
+
+
+if __name__ == '__main__':
+    _sparse_costs_test()
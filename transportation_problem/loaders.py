@@ -0,0 +1,177 @@
+import csv
+import itertools
+
+import numpy as np
+
+from transportation_problem.problem import TransportationProblem
+from transportation_problem.lanes import SparseCosts
+
+
+def load_csv(supply_path, demand_path, costs_path, lanes=False, delimiter=',', header=False, chunksize=1024):
+    """
+    从 CSV 文件读取运输问题
+
+    产地、销地文件每行为 "名称,数量"；运价文件为 m 行 n 列的运价矩阵，
+    或 lanes=True 时每行为一条线路 "产地索引,销地索引,运价"。
+    运价文件按 chunksize 行一块读入预先分配好的数组，不为每个运价构造 Python 对象。
+
+    :param supply_path: 产地文件
+    :param demand_path: 销地文件
+    :param costs_path: 运价文件
+    :param lanes: 运价文件是否为稀疏的线路表
+    :param delimiter: 分隔符
+    :param header: 各文件第一行是否为表头
+    :param chunksize: 每次读入的运价文件行数
+    :return: TransportationProblem
+    """
+    supply_names, supply = _read_quantities(supply_path, delimiter, header)
+    demand_names, demand = _read_quantities(demand_path, delimiter, header)
+    shape = (len(supply), len(demand))
+
+    with open(costs_path) as f:
+        if header:
+            next(f, None)
+        lines = (line for line in f if line.strip())
+        if lanes:
+            chunks = list(_read_chunks(lines, delimiter, chunksize))
+            triples = np.concatenate(chunks) if chunks else np.empty((0, 3))
+            costs = SparseCosts(triples[:, 0].astype(int), triples[:, 1].astype(int), triples[:, 2], shape)
+        else:
+            costs = np.empty(shape)
+            start = 0
+            for chunk in _read_chunks(lines, delimiter, chunksize):
+                if start + len(chunk) > shape[0] or chunk.shape[1] != shape[1]:
+                    raise ValueError(f'costs in {costs_path} do not match the shape {shape}')
+                costs[start:start + len(chunk)] = chunk
+                start += len(chunk)
+            if start != shape[0]:
+                raise ValueError(f'costs in {costs_path} do not match the shape {shape}')
+    return TransportationProblem.from_arrays(supply, demand, costs, supply_names, demand_names)
+
+
+def load_npz(path, mmap_mode=None):
+    """
+    从 save_npz 保存的 .npz 文件(或由 .npy 文件组成的目录)读取运输问题
+
+    文件中有 supply、demand 与 costs (稠密运价)，或 rows、cols、costs (稀疏线路)，
+    以及可选的 supply_names、demand_names。
+    :param path: .npz 文件，或包含 supply.npy、demand.npy、costs.npy 等文件的目录
+    :param mmap_mode: 读目录时以这个模式内存映射各 .npy 文件(如 'r')，不把运价整个读入内存；.npz 文件不支持
+    :return: TransportationProblem
+    """
+    if str(path).endswith('.npz'):
+        with np.load(path) as data:
+            arrays = {key: data[key] for key in data.files}
+    else:
+        arrays = {}
+        for key in ('supply', 'demand', 'costs', 'rows', 'cols', 'supply_names', 'demand_names'):
+            try:
+                arrays[key] = np.load(f'{path}/{key}.npy', mmap_mode=None if key.endswith('names') else mmap_mode)
+            except FileNotFoundError:
+                pass
+    return _from_arrays(arrays)
+
+
+def load_npy(supply_path, demand_path, costs_path, mmap_mode='r'):
+    """
+    从三个 .npy 文件读取运输问题，运价默认内存映射
+    :return: TransportationProblem
+    """
+    supply, demand = np.load(supply_path), np.load(demand_path)
+    return TransportationProblem.from_arrays(supply, demand, np.load(costs_path, mmap_mode=mmap_mode))
+
+
+def load_memmap(costs_path, supply, demand, dtype=np.float64, offset=0, mode='r'):
+    """
+    运价为按行优先存放的原始二进制文件，以内存映射读取
+    :param costs_path: 运价文件
+    :param supply: 各产地产量(一维数组)
+    :param demand: 各销地销量(一维数组)
+    :param dtype: 运价的数据类型
+    :param offset: 运价数据在文件中的起始字节
+    :param mode: 内存映射模式
+    :return: TransportationProblem
+    """
+    costs = np.memmap(costs_path, dtype=dtype, mode=mode, offset=offset, shape=(len(supply), len(demand)))
+    return TransportationProblem.from_arrays(supply, demand, costs)
+
+
+def save_npz(problem: TransportationProblem, path):
+    """
+    把运输问题保存为 .npz 文件，可用 load_npz 读取
+    """
+    arrays = dict(supply=np.array([i[1] for i in problem.supply]), demand=np.array([i[1] for i in problem.demand]),
+                  supply_names=np.array([str(i[0]) for i in problem.supply]),
+                  demand_names=np.array([str(i[0]) for i in problem.demand]))
+    if isinstance(problem.costs, SparseCosts):
+        arrays.update(rows=problem.costs.rows, cols=problem.costs.cols, costs=problem.costs.costs)
+    else:
+        arrays.update(costs=np.asarray(problem.costs))
+    np.savez(path, **arrays)
+
+
+def _from_arrays(arrays) -> TransportationProblem:
+    supply, demand, costs = arrays['supply'], arrays['demand'], arrays['costs']
+    if 'rows' in arrays:
+        costs = SparseCosts(arrays['rows'], arrays['cols'], costs, (len(supply), len(demand)))
+    return TransportationProblem.from_arrays(supply, demand, costs,
+                                             arrays.get('supply_names'), arrays.get('demand_names'))
+
+
+def _read_quantities(path, delimiter, header) -> (list, np.ndarray):
+    """
+    读 "名称,数量" 文件
+    :return: (名称, 数量)
+    """
+    with open(path, newline='') as f:
+        rows = [row for row in csv.reader(f, delimiter=delimiter) if row]
+    if header:
+        rows = rows[1:]
+    quantities = np.array([row[1].strip() for row in rows])
+    try:
+        quantities = quantities.astype(np.int64)
+    except ValueError:
+        quantities = quantities.astype(np.float64)
+    return [row[0].strip() for row in rows], quantities
+
+
+def _read_chunks(lines, delimiter, chunksize):
+    """
+    每次从 lines 中取 chunksize 行解析为二维数组
+    """
+    while True:
+        chunk = list(itertools.islice(lines, chunksize))
+        if not chunk:
+            return
+        yield np.loadtxt(chunk, delimiter=delimiter, ndmin=2)
+
+
+# Tests
+def _loaders_test():
+    import os
+    import tempfile
+
+    sp = [('A1', 14), ('A2', 27), ('A3', 19)]
+    dm = [('B1', 22), ('B2', 13), ('B3', 12), ('B4', 13)]
+    ct = [[6, 7, 5, 3], [8, 4, 2, 7], [5, 9, 10, 6]]
+    with tempfile.TemporaryDirectory() as d:
+        for name, rows in (('s.csv', sp), ('d.csv', dm), ('c.csv', ct)):
+            with open(os.path.join(d, name), 'w') as f:
+                f.writelines(','.join(map(str, row)) + '\n' for row in rows)
+        p = load_csv(*(os.path.join(d, name) for name in ('s.csv', 'd.csv', 'c.csv')), chunksize=2)
+        assert p.supply[1] == ('A2', 27) and np.array_equal(p.costs, ct)
+        assert p.solve().total_cost == 232
+
+        save_npz(p, os.path.join(d, 'p.npz'))
+        q = load_npz(os.path.join(d, 'p.npz'))
+        assert q.demand == p.demand and q.solve().total_cost == 232
+
+        np.array(ct, dtype=np.float64).tofile(os.path.join(d, 'c.bin'))
+        r = load_memmap(os.path.join(d, 'c.bin'), [14, 27, 19], [22, 13, 12, 13])
+        assert isinstance(r.costs, np.memmap) and r.solve().total_cost == 232
+        del r  # 释放内存映射
+    print("loaders_test pass")
+
+
+if __name__ == '__main__':
+    _loaders_test()
@@ -1,6 +1,8 @@
 import numpy as np
 import warnings
-from transportation_problem.closed_loop_method import ClosedLoopMethod
+from transportation_problem.basis import TransportationBasis, _leaving
+from transportation_problem.closed_loop_method import TreeClosedLoopMethod
+from transportation_problem.pricing import PricedCells
 
 warnings.simplefilter(action="ignore", category=RuntimeWarning)
 
@@ -8,16 +10,28 @@ warnings.simplefilter(action="ignore", category=RuntimeWarning)
 class TransportationOptimizer(object):
     """
     TransportationOptimizer 运输问题的优化器
+
+    accepts_basis 为 True 的优化器还可以直接在 TransportationBasis 上原址换基。
+    每次 optimize 后记录 entering (进基变量 (r, c, 检验数))、closed_loop (闭回路 (rows, cols)) 与 adjustment (调整量)，
+    供 SolveStats 统计，没有调整时 entering 为 None。
+
+    leaving_rule 为出基规则('first' 或 'lowest_index'，见 TransportationPricing)，使用定价规则时由 solve() 按定价规则设置
     """
 
+    accepts_basis = False
+    leaving_rule = 'first'
+
     def __init__(self, supply: list, demand: list, costs: list):
         super().__init__()
         # TODO: supply, demand, costs 在 optimizer 中好像都没用，可以考虑删除
         self.supply = [i[1] for i in supply]
         self.demand = [i[1] for i in demand]
-        self.costs = np.array(costs)
+        self.costs = costs  # 不转为 ndarray：CostIndex 时不复制，也不补齐其中虚拟的行、列
         self.transportation = np.array([])
         self.sigma = np.array([])
+        self.entering = None
+        self.closed_loop = None
+        self.adjustment = None
 
     def optimize(self, transportation: list, sigma: list) -> list:
         """
@@ -32,43 +46,76 @@ class ClosedLoopAdjustmentOptimizer(TransportationOptimizer):
     闭回路调整法
     """
 
+    accepts_basis = True
+
     def __init__(self, supply: list, demand: list, costs: list):
         super().__init__(supply, demand, costs)
 
-    def optimize(self, transportation: list, sigma: list) -> list:
-        self.transportation = np.array(transportation)
-        self.sigma = np.array(sigma)
-
-        rs, cs = np.where(self.sigma < 0)
-        # 这里可能会抛出 RuntimeWarning: invalid value encountered in less
-        # 这没关系，参考：https://stackoverflow.com/questions/34955158/what-might-be-the-cause-of-invalid-value-encountered-in-less-equal-in-numpy
-        # 我在文开始的地方 ignore 了 RuntimeWarning 来阻止这个的显示
-        if len(rs) == 0:  # 。。。这没啥好优化的了，直接扔回去吧
-            return list(self.transportation.tolist())
-        # 选最小的检验数
-        min_r_idx, min_c_idx = rs[0], cs[0]
-        for i in range(len(rs)):
-            if self.sigma[rs[i]][cs[i]] < self.sigma[min_r_idx][min_c_idx]:
-                min_r_idx, min_c_idx = rs[i], cs[i]
+    def optimize(self, transportation, sigma):
+        """
+        优化。传入 TransportationBasis 时在其上原址换基并返回它本身
+        :param sigma: 检验数矩阵，或定价规则给出的 PricedCells
+        :return: (新的transportation)
+        """
+        entering = self._choose_entering(sigma)
+        self.entering = None
+        if entering is None:  # 。。。这没啥好优化的了，直接扔回去吧
+            return transportation
+        min_r_idx, min_c_idx = entering
+        if isinstance(self.sigma, PricedCells):
+            self.entering = (min_r_idx, min_c_idx, float(np.min(self.sigma.sigma)))
+        else:
+            self.entering = (min_r_idx, min_c_idx, float(self.sigma[min_r_idx, min_c_idx]))
+
+        if isinstance(transportation, TransportationBasis):
+            self.closed_loop = transportation.pivot(min_r_idx, min_c_idx, self.leaving_rule)
+            self.adjustment = float(transportation.transportation[min_r_idx, min_c_idx])
+            return transportation
+
+        self.transportation = np.array(transportation, dtype=float)
+        # 检验数为 nan 的格子都是基变量，检验器补上的退化基变量在这里记为 0 运量
+        self.transportation[np.isnan(self.sigma) & np.isnan(self.transportation)] = 0
         # 找闭回路
-        closed_loop = ClosedLoopMethod(self.sigma).get_closed_loop(min_r_idx, min_c_idx)
+        self.closed_loop = TreeClosedLoopMethod(self.sigma).get_closed_loop(min_r_idx, min_c_idx)
         # 调整
-        self._closed_loop_adjust(closed_loop)
+        self._closed_loop_adjust(self.closed_loop)
+        self.adjustment = float(self.transportation[min_r_idx, min_c_idx])
         return list(self.transportation.tolist())
 
+    def _choose_entering(self, sigma):
+        """
+        选进基变量：检验数最小(最负)的非基变量，有多个时取行优先顺序中的第一个
+        :return: (r, c)，没有负检验数时为 None
+        """
+        if isinstance(sigma, PricedCells):  # 定价规则已经只给出了需要的候选
+            self.sigma = sigma
+            if len(sigma.sigma) == 0:
+                return None
+            k = int(np.argmin(sigma.sigma))
+            return sigma.rows[k], sigma.cols[k]
+
+        self.sigma = np.array(sigma, dtype=float)
+        if not np.any(self.sigma < 0):
+            return None
+        return np.unravel_index(np.nanargmin(self.sigma), self.sigma.shape)
+
     def _closed_loop_adjust(self, loop):
         """
         在闭回路中调整运量，在 self.transportation 原址操作
-        :param loop: 闭回路
+        :param loop: 闭回路 (rows, cols)，下标 0 为进基变量
         :return: None
         """
+        rows, cols = loop
+        trans = np.nan_to_num(self.transportation[rows, cols])
         # 闭回路中最小的运量，下标从0开始，所以取奇数(1, 3)
-        min_trans = min([self.transportation[n.row_idx][n.col_idx] for n in loop][1::2])
+        k = _leaving(trans[1::2], rows[1::2], cols[1::2], self.leaving_rule)
+        min_trans = trans[2 * k + 1]
         # 调整，下标从0开始，所以是偶加奇减(0+, 1-, 2+, 3-)
-        for i, n in enumerate(loop):
-            if np.isnan(self.transportation[n.row_idx][n.col_idx]):
-                self.transportation[n.row_idx][n.col_idx] = 0
-            self.transportation[n.row_idx][n.col_idx] += min_trans - 2 * (i % 2) * min_trans
+        trans[0::2] += min_trans
+        trans[1::2] -= min_trans
+        self.transportation[rows, cols] = trans
+        # 出基：即使有多个运量变为 0 的格子，也只让一个离开，保持基变量个数不变
+        self.transportation[rows[2 * k + 1], cols[2 * k + 1]] = np.nan
 
 
 # Tests
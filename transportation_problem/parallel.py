@@ -0,0 +1,246 @@
+import multiprocessing
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from queue import Empty
+
+import numpy as np
+
+from transportation_problem.problem import TransportationProblem, TransportationResult
+from transportation_problem.initer import MinimumElementIniter, NorthwestCornerIniter, VogelIniter
+from transportation_problem.checker import SpanningTreePotentialChecker
+from transportation_problem.optimizer import ClosedLoopAdjustmentOptimizer
+from transportation_problem.lanes import SparseCosts
+
+
+def solve_parallel(problems, initer_class=MinimumElementIniter, checker_class=SpanningTreePotentialChecker,
+                   optimizer_class=ClosedLoopAdjustmentOptimizer, pricing_class=None, solver_class=None,
+                   max_workers=None, chunksize=1, ordered=True, timeout=None):
+    """
+    用进程池并行求解一批相互独立的运输问题
+
+    发给子进程的只有产量、销量与运价的 ndarray(或 SparseCosts)，子进程只传回有运量的格子 (行, 列, 运量)、
+    status 与 lower_bound，由主进程组装成 TransportationResult (不含 basis)。
+
+    :param problems:        TransportationProblem 的列表
+    :param initer_class:    初始方案求解器，同 TransportationProblem.solve
+    :param checker_class:   最优方案检验器，同 TransportationProblem.solve
+    :param optimizer_class: 运输方案优化器，同 TransportationProblem.solve
+    :param pricing_class:   定价规则，同 TransportationProblem.solve
+    :param solver_class:    求解器，同 TransportationProblem.solve
+    :param max_workers:     进程数，None 为 CPU 核数
+    :param chunksize:       每个任务包含的问题数，问题很小时调大可以减少进程间通信
+    :param ordered:         为 True 时按 problems 的顺序 yield 结果；
+                            为 False 时按完成的先后 yield (problems 中的下标, 结果)
+    :param timeout:         每个问题的求解时限(秒)，超时的问题结果为 None。依赖 SIGALRM，不支持的平台上不限时
+    :return: 依次 yield 各个问题的 TransportationResult
+    """
+    problems = list(problems)
+    options = dict(initer_class=initer_class, checker_class=checker_class, optimizer_class=optimizer_class,
+                   pricing_class=pricing_class, solver_class=solver_class)
+    chunks = [range(start, min(start + chunksize, len(problems))) for start in range(0, len(problems), chunksize)]
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(_solve_chunk, [_pack(problems[i]) for i in chunk], options, timeout): chunk
+                   for chunk in chunks}
+        if ordered:
+            for future in futures:
+                for i, solved in zip(futures[future], future.result()):
+                    yield _unpack(problems[i], solved)
+        else:
+            for future in as_completed(futures):
+                for i, solved in zip(futures[future], future.result()):
+                    yield i, _unpack(problems[i], solved)
+
+
+def solve_portfolio(problem: TransportationProblem, strategies=None, timeout=None):
+    """
+    组合求解：每个子进程用一种策略(初始化方法、定价规则等)求解同一个问题，取最先求得最优解的一个，其余进程随即终止。
+    因 max_iter、time_limit 等提前停止的策略不算获胜；没有策略求得最优解时，返回其中总运价最低的方案
+
+    :param problem:    TransportationProblem
+    :param strategies: 各策略的 TransportationProblem.solve 参数，如
+                       [dict(initer_class=tp.VogelIniter), dict(initer_class=tp.MinimumElementIniter, pricing_class=tp.PartialPricing)]。
+                       默认为三种初始化方法各一个，都用 SpanningTreePotentialChecker 检验
+    :param timeout:    时限(秒)，超时返回 None
+    :return: TransportationResult (不含 basis)；所有策略都出错时抛出第一个策略的异常
+    """
+    if strategies is None:
+        strategies = [dict(initer_class=initer_class, checker_class=SpanningTreePotentialChecker)
+                      for initer_class in (NorthwestCornerIniter, MinimumElementIniter, VogelIniter)]
+    packed = _pack(problem)
+    results = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=_race, args=(k, packed, options, results), daemon=True)
+               for k, options in enumerate(strategies)]
+    for worker in workers:
+        worker.start()
+
+    deadline = None if timeout is None else time.monotonic() + timeout
+    errors, stopped = {}, []
+    try:
+        while len(errors) + len(stopped) < len(workers):
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                k, solved, error = results.get(timeout=remaining)
+            except Empty:
+                return None
+            if error is not None:
+                errors[k] = error
+                continue
+            result = _unpack(problem, solved)
+            if result.status == 'optimal':
+                return result
+            stopped.append(result)  # 提前停止的可行方案
+        if stopped:
+            return min(stopped, key=lambda result: result.total_cost)
+        raise errors[min(errors)]
+    finally:
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+            worker.join()
+
+
+def solve_decomposed(problem: TransportationProblem, initer_class=MinimumElementIniter,
+                     checker_class=SpanningTreePotentialChecker, optimizer_class=ClosedLoopAdjustmentOptimizer,
+                     pricing_class=None, solver_class=None, max_workers=None, timeout=None):
+    """
+    把问题分解为互不相连的几部分(见 TransportationProblem.solve 的 decompose)，用进程池并行求解各部分，再拼成一个结果。
+    不能分解时直接求解整个问题
+
+    :param problem:    TransportationProblem
+    :param max_workers: 进程数，None 为 CPU 核数
+    :param timeout:    每一部分的求解时限(秒)，有一部分超时则返回 None
+    其余参数同 solve_parallel
+    :return: TransportationResult (不含 basis)
+    """
+    index = problem._validate()  # 稠密运价的 CostIndex 只构造一次，分解与各子问题共用
+    components = problem._components(index)
+    if not components:
+        return problem.solve(initer_class, checker_class, optimizer_class, pricing_class, solver_class)
+    subproblems = [problem._subproblem(rs, cs, index) for rs, cs in components]
+    results = list(solve_parallel(subproblems, initer_class, checker_class, optimizer_class, pricing_class, solver_class,
+                                  max_workers=max_workers, timeout=timeout))
+    if any(result is None for result in results):
+        return None
+    return problem._stitch(components, results)
+
+
+def _race(k, packed, options, results):
+    try:
+        results.put((k, _solve_packed(packed, options, None), None))
+    except Exception as e:
+        results.put((k, None, e))
+
+
+def _pack(problem: TransportationProblem):
+    """
+    把运输问题压缩成 (产量, 销量, 运价) 的数组，名称留在主进程中
+    """
+    costs = problem.costs if isinstance(problem.costs, SparseCosts) else np.asarray(problem.costs)
+    return np.array([i[1] for i in problem.supply]), np.array([i[1] for i in problem.demand]), costs
+
+
+def _unpack(problem: TransportationProblem, solved):
+    if solved is None:
+        return None
+    rows, cols, quantities, status, lower_bound = solved
+    result = TransportationResult.from_cells(problem, rows, cols, quantities, status=status)
+    result.lower_bound = lower_bound
+    return result
+
+
+class _Timeout(Exception):
+    pass
+
+
+def _raise_timeout(signum, frame):
+    raise _Timeout()
+
+
+def _solve_chunk(chunk, options, timeout):
+    return [_solve_packed(packed, options, timeout) for packed in chunk]
+
+
+def _solve_packed(packed, options, timeout):
+    """
+    在子进程中求解一个压缩后的问题
+    :return: 有运量的格子 (rows, cols, quantities) 与 status、lower_bound，超时为 None
+    """
+    supply, demand, costs = packed
+    problem = TransportationProblem(list(enumerate(supply.tolist())), list(enumerate(demand.tolist())), costs)
+    if timeout is None or not hasattr(signal, 'setitimer'):
+        result = problem.solve(**options)
+    else:
+        previous = signal.signal(signal.SIGALRM, _raise_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+        try:
+            result = problem.solve(**options)
+        except _Timeout:
+            return None
+        finally:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
+    return result.rows, result.cols, result.quantities, result.status, result.lower_bound
+
+
+# Tests
+def _solve_parallel_test():
+    p1 = TransportationProblem([('A1', 14), ('A2', 27), ('A3', 19)], [('B1', 22), ('B2', 13), ('B3', 12), ('B4', 13)],
+                               [[6, 7, 5, 3], [8, 4, 2, 7], [5, 9, 10, 6]])
+    p2 = TransportationProblem([('I', 2500), ('II', 2500), ('III', 5000)], [('A', 1500), ('B', 2000), ('C', 3000), ('D', 3500)],
+                               [[0, 5, 4, 3], [2, 8, 3, 4], [1, 7, 6, 2]])
+    problems = [p1, p2, p1, p2, p1]
+    expected = [p.solve(checker_class=SpanningTreePotentialChecker).total_cost for p in problems]
+    results = list(solve_parallel(problems, max_workers=2, chunksize=2))
+    assert [r.total_cost for r in results] == expected and results[0].problem is p1
+    results = dict(solve_parallel(problems, max_workers=2, ordered=False))
+    assert [results[i].total_cost for i in range(len(problems))] == expected
+    print("solve_parallel_test pass")
+
+
+def _solve_portfolio_test():
+    problem = TransportationProblem([('A1', 7), ('A2', 4), ('A3', 9)], [('B1', 3), ('B2', 6), ('B3', 5), ('B4', 6)],
+                                    [[3, 11, 3, 10], [1, 9, 2, 8], [7, 4, 10, 5]])
+    assert solve_portfolio(problem).total_cost == 85
+    # 提前停止的策略即使先完成也不算获胜
+    stopped = dict(initer_class=NorthwestCornerIniter, checker_class=SpanningTreePotentialChecker, max_iter=0)
+    result = solve_portfolio(problem, [stopped, dict(initer_class=MinimumElementIniter)])
+    assert result.status == 'optimal' and result.total_cost == 85
+    result = solve_portfolio(problem, [stopped])
+    assert result.status == 'iteration_limit' and result.lower_bound <= 85 < result.total_cost
+    print("solve_portfolio_test pass")
+
+
+def _solve_decomposed_test():
+    from transportation_problem.solver import NetworkSimplexSolver
+
+    ct = np.full((4, 4), np.inf)
+    ct[:2, :2] = [[6, 7], [8, 4]]
+    ct[2:, 2:] = [[2, 7], [10, 6]]
+    problem = TransportationProblem([('A1', 10), ('A2', 5), ('A3', 8), ('A4', 4)],
+                                    [('B1', 6), ('B2', 9), ('B3', 5), ('B4', 7)], ct)
+    assert len(problem._components()) == 2
+    result = solve_decomposed(problem, max_workers=2)
+    assert result.total_cost == problem.solve(checker_class=SpanningTreePotentialChecker).total_cost == 139
+    assert result.transportation == [[6, 4, 0, 0], [0, 5, 0, 0], [0, 0, 5, 3], [0, 0, 0, 4]], result.transportation
+
+    # 运价为 inf 的格子在表上作业法中换成大 M，不分解时结果也与网络单纯形法相同
+    ct[0, 2] = ct[3, 1] = 1
+    problem = TransportationProblem(problem.supply, problem.demand, ct)
+    expected = problem.solve(solver_class=NetworkSimplexSolver).total_cost
+    for initer_class in (MinimumElementIniter, VogelIniter, NorthwestCornerIniter):
+        result = problem.solve(initer_class, decompose=False)
+        assert result.status == 'optimal' and result.total_cost == expected, (initer_class, result.total_cost)
+
+    # 没有运量要安排时没有连通分量，照常求解
+    problem = TransportationProblem.from_lanes([('a', 0), ('b', 0)], [('x', 0), ('y', 0)], [(0, 0, 1), (1, 1, 2)])
+    assert problem._components() == []
+    assert problem.solve().total_cost == solve_decomposed(problem).total_cost == 0
+    print("solve_decomposed_test pass")
+
+
+if __name__ == '__main__':
+    _solve_parallel_test()
+    _solve_portfolio_test()
+    _solve_decomposed_test()
@@ -0,0 +1,205 @@
+from collections import namedtuple
+
+import numpy as np
+
+# 定价结果：找到的若干检验数为负的非基变量及其检验数，为空表示已达到最优
+PricedCells = namedtuple('PricedCells', ['rows', 'cols', 'sigma'])
+
+
+class TransportationPricing(object):
+    """
+    TransportationPricing 定价规则：在 TransportationBasis 上只计算需要的检验数，选出进基变量的候选
+
+    定价规则是有状态的(如分块定价记得上次扫描到哪里)，每次求解都要新建一个实例。
+    整数模式下的检验数转为 float 后仍是精确的整数(绝对值小于 2**53 时)，基变量处记为 inf。
+
+    由于 σ_ij = c_ij - u_i - v_j >= min_j c_ij - u_i - max_j v_j，用 CostIndex 中各行(列)的最低运价
+    可以先排除整行(列)都不可能有负检验数的行(列)，只对其余的行(列)定价，选出的进基变量不变。
+
+    leaving_rule 为配合这个定价规则使用的出基规则，由优化器采用：
+        - 'first': 闭回路上运量最小的格子中第一个
+        - 'lowest_index': 运量最小的格子中(行优先)下标最小的
+    """
+
+    leaving_rule = 'first'
+
+    def __init__(self):
+        super().__init__()
+
+    def price(self, basis) -> PricedCells:
+        """
+        定价
+        :param basis: TransportationBasis
+        :return: PricedCells，为空则说明所有检验数均非负
+        """
+        raise NotImplementedError
+
+    @staticmethod
+    def _sigma_of_cols(basis, cols) -> np.ndarray:
+        """
+        求 cols 这些列上的检验数，基变量处为 inf
+        """
+        sigma = np.asarray(basis.index.take_cols(cols) - basis.u[:, None] - basis.v[None, cols], dtype=float)
+        sigma[basis.is_basic[:, cols]] = np.inf
+        return sigma
+
+    @staticmethod
+    def _sigma_of_cells(basis, flat) -> np.ndarray:
+        """
+        求 flat (展平后的下标) 这些格子的检验数，基变量处为 inf
+        """
+        rs, cs = np.unravel_index(flat, basis.shape)
+        sigma = np.asarray(basis.index.lookup(rs, cs) - basis.u[rs] - basis.v[cs], dtype=float)
+        sigma[basis.is_basic[rs, cs]] = np.inf
+        return sigma
+
+    @staticmethod
+    def _live_rows(basis) -> np.ndarray:
+        """
+        :return: 可能有负检验数的行, bool ndarray
+        """
+        return basis.index.row_min - basis.u - basis.v.max() < 0
+
+    @staticmethod
+    def _live_cols(basis) -> np.ndarray:
+        """
+        :return: 可能有负检验数的列, bool ndarray
+        """
+        return basis.index.col_min - basis.v - basis.u.max() < 0
+
+    @staticmethod
+    def _empty() -> PricedCells:
+        return PricedCells(np.array([], dtype=int), np.array([], dtype=int), np.array([]))
+
+
+class DantzigPricing(TransportationPricing):
+    """
+    最小检验数规则(Dantzig)：计算全部检验数，选最小的。迭代次数少，但每次都要全部定价
+    """
+
+    def price(self, basis) -> PricedCells:
+        rs = np.flatnonzero(self._live_rows(basis))
+        if len(rs) == 0:
+            return self._empty()
+        sigma = np.asarray(basis.index.take_rows(rs) - basis.u[rs, None] - basis.v[None, :], dtype=float)
+        sigma[basis.is_basic[rs]] = np.inf
+        k = int(np.argmin(sigma))
+        if not sigma.flat[k] < 0:
+            return self._empty()
+        r, c = np.unravel_index(k, sigma.shape)
+        return PricedCells(np.array([rs[r]]), np.array([c]), np.array([sigma.flat[k]]))
+
+
+class FirstNegativePricing(TransportationPricing):
+    """
+    首个负检验数规则：按行优先顺序逐块定价，遇到第一个检验数为负的非基变量就选它
+    """
+
+    def __init__(self, block_size=None):
+        super().__init__()
+        self.block_size = block_size
+
+    def price(self, basis) -> PricedCells:
+        m, n = basis.shape
+        block_rows = max(1, (self.block_size or int(np.ceil(np.sqrt(m * n)))) // n)
+        live = np.flatnonzero(self._live_rows(basis))
+        for start in range(0, len(live), block_rows):
+            rs = live[start:start + block_rows]
+            sigma = np.asarray(basis.index.take_rows(rs) - basis.u[rs, None] - basis.v[None, :], dtype=float)
+            sigma[basis.is_basic[rs]] = np.inf
+            negative = np.flatnonzero(sigma < 0)
+            if len(negative) > 0:
+                r, c = np.unravel_index(negative[0], sigma.shape)
+                return PricedCells(np.array([rs[r]]), np.array([c]), np.array([sigma[r, c]]))
+        return self._empty()
+
+
+class BlandPricing(FirstNegativePricing):
+    """
+    Bland 规则：进基变量取检验数为负的非基变量中(行优先)下标最小的，出基变量取运量最小的格子中下标最小的。
+    迭代次数可能较多，但不会循环
+    """
+
+    leaving_rule = 'lowest_index'
+
+
+class PartialPricing(TransportationPricing):
+    """
+    部分定价(候选列表)：把列分成若干块，轮流定价。
+
+    在一块中找到负检验数时，把最小的若干个记入候选列表；之后的迭代先重新定价候选列表，
+    候选列表里没有负检验数了，才继续扫描下一块。
+    """
+
+    def __init__(self, block_size=None, candidates=None):
+        super().__init__()
+        self.block_size = block_size
+        self.candidates = candidates
+        self._next_block = 0
+        self._candidate_list = np.array([], dtype=int)  # 展平后的下标
+
+    def price(self, basis) -> PricedCells:
+        n = basis.shape[1]
+        block_size = self.block_size or max(1, int(np.ceil(np.sqrt(n))))
+        capacity = self.candidates or block_size
+
+        # 先看候选列表
+        if len(self._candidate_list) > 0:
+            sigma = self._sigma_of_cells(basis, self._candidate_list)
+            self._candidate_list = self._candidate_list[sigma < 0]
+            sigma = sigma[sigma < 0]
+            if len(sigma) > 0:
+                return self._cells(basis, self._candidate_list, sigma)
+
+        # 候选列表空了，从上次停下的块开始扫描，直到找到负检验数或扫描完所有块
+        live = self._live_cols(basis)
+        blocks = (n + block_size - 1) // block_size
+        for i in range(blocks):
+            b = (self._next_block + i) % blocks
+            cols = np.arange(b * block_size, min((b + 1) * block_size, n))
+            cols = cols[live[cols]]
+            sigma = self._sigma_of_cols(basis, cols)
+            negative = np.flatnonzero(sigma < 0)
+            if len(negative) > 0:
+                self._next_block = (b + 1) % blocks
+                negative = negative[np.argsort(sigma.flat[negative], kind='stable')[:capacity]]
+                rs, cs = np.unravel_index(negative, sigma.shape)
+                self._candidate_list = np.ravel_multi_index((rs, cols[cs]), basis.shape)
+                return self._cells(basis, self._candidate_list, sigma.flat[negative])
+        return self._empty()
+
+    @staticmethod
+    def _cells(basis, flat, sigma) -> PricedCells:
+        rs, cs = np.unravel_index(flat, basis.shape)
+        return PricedCells(rs, cs, sigma)
+
+
+class BlockSearchPricing(TransportationPricing):
+    """
+    分块搜索定价：把所有格子按行优先顺序分成大小约为 sqrt(m*n) 的块，从上次停下的块开始轮流定价，
+    选第一个含有负检验数的块中最小的检验数
+    """
+
+    def __init__(self, block_size=None):
+        super().__init__()
+        self.block_size = block_size
+        self._next = 0
+
+    def price(self, basis) -> PricedCells:
+        size = basis.shape[0] * basis.shape[1]
+        block_size = self.block_size or max(1, int(np.ceil(np.sqrt(size))))
+        blocks = (size + block_size - 1) // block_size
+        live = self._live_rows(basis)
+        for i in range(blocks):
+            start = ((self._next // block_size + i) % blocks) * block_size
+            flat = np.arange(start, min(start + block_size, size))
+            flat = flat[live[flat // basis.shape[1]]]
+            if len(flat) == 0:
+                continue
+            sigma = self._sigma_of_cells(basis, flat)
+            k = int(np.argmin(sigma))
+            if sigma[k] < 0:
+                self._next = start + block_size
+                r, c = np.unravel_index(flat[k], basis.shape)
+                return PricedCells(np.array([r]), np.array([c]), np.array([sigma[k]]))
+        return self._empty()
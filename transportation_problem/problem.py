@@ -1,6 +1,16 @@
 from transportation_problem.initer import TransportationIniter, MinimumElementIniter
 from transportation_problem.checker import TransportationChecker, PotentialChecker
 from transportation_problem.optimizer import TransportationOptimizer, ClosedLoopAdjustmentOptimizer
+from transportation_problem.basis import TransportationBasis
+from transportation_problem.pricing import TransportationPricing
+from transportation_problem.solver import TransportationSolver, NetworkSimplexSolver
+from transportation_problem.lanes import SparseCosts
+from transportation_problem.core import CostIndex
+from transportation_problem.stats import SolveStats
+from transportation_problem.sensitivity import SensitivityAnalysis
+
+import time
+from functools import cached_property
 
 import numpy as np
 
@@ -12,7 +22,7 @@ class TransportationProblem(object):
     属性：
         - supply: 产地: [('name', 产量), ...]
         - demand: 销地: [('name', 销量), ...]
-        - costs:  运价: [[1, 2, 3, ...], [4, 5, 6, ...], ...]
+        - costs:  运价: [[1, 2, 3, ...], [4, 5, 6, ...], ...]，或只记录存在线路的 SparseCosts
         - result: 运输问题求解结果，在调用 transportationProblem.solve(...) ，求解成功后才有非 None 值。
 
     方法：
@@ -26,33 +36,466 @@ class TransportationProblem(object):
         self.costs = costs
         self.result = None
 
-    def solve(self, initer_class=MinimumElementIniter, checker_class=PotentialChecker, optimizer_class=ClosedLoopAdjustmentOptimizer):
+    @classmethod
+    def from_lanes(cls, supply: list, demand: list, lanes):
+        """
+        从稀疏的线路表构造运输问题，不在线路表中的 产地->销地 不能运输
+        :param supply: 产地: [('name', 产量), ...]
+        :param demand: 销地: [('name', 销量), ...]
+        :param lanes: SparseCosts、scipy.sparse 风格的稀疏矩阵，或 COO 三元组 [(产地索引, 销地索引, 运价), ...]
+        :return: TransportationProblem
+        """
+        if not isinstance(lanes, SparseCosts):
+            if hasattr(lanes, 'tocoo'):
+                lanes = SparseCosts.from_scipy(lanes)
+            else:
+                lanes = SparseCosts.from_triples(lanes, (len(supply), len(demand)))
+        return cls(supply, demand, lanes)
+
+    @classmethod
+    def from_arrays(cls, supply, demand, costs, supply_names=None, demand_names=None):
+        """
+        从数值数组构造运输问题，名称与数值分开给出。运价保持原样(如 np.memmap)，不转为嵌套的 list
+        :param supply: 各产地产量，一维数组
+        :param demand: 各销地销量，一维数组
+        :param costs: 运价，m×n 数组或 SparseCosts
+        :param supply_names: 各产地名称，None 为 0, 1, 2, ...
+        :param demand_names: 各销地名称，None 为 0, 1, 2, ...
+        :return: TransportationProblem
+        """
+        supply, demand = np.asarray(supply).tolist(), np.asarray(demand).tolist()
+        supply_names = range(len(supply)) if supply_names is None else np.asarray(supply_names).tolist()
+        demand_names = range(len(demand)) if demand_names is None else np.asarray(demand_names).tolist()
+        return cls(list(zip(supply_names, supply)), list(zip(demand_names, demand)), costs)
+
+    def _validate(self):
+        """
+        在求解前检查输入，有问题时抛出 ValueError
+        :return: 稠密运价的 CostIndex (见 _dense_index)，稀疏问题为 None
+        """
+        m, n = len(self.supply), len(self.demand)
+        if m == 0 or n == 0:
+            raise ValueError('supply and demand must not be empty')
+        quantities = np.array([i[1] for i in self.supply] + [i[1] for i in self.demand], dtype=float)
+        if not np.all(np.isfinite(quantities)) or np.any(quantities < 0):
+            raise ValueError('supply and demand must be finite and non-negative')
+        if isinstance(self.costs, SparseCosts):
+            index, costs, shape = None, self.costs.costs, self.costs.shape
+        else:
+            index = self._dense_index()
+            costs, shape = index.base, index.shape
+        if shape != (m, n):
+            raise ValueError(f'costs shape {shape} does not match {m} supplies and {n} demands')
+        if (index is None or not index.finite.all()) and np.any(np.isnan(costs)):
+            raise ValueError('costs must not be nan')
+        return index
+
+    def _dense_index(self) -> CostIndex:
+        """
+        稠密运价的 CostIndex：运价本身就是 CostIndex 时直接使用，否则复制一次。
+        solve 只构造一次，传给分解、产销平衡与表上作业法各步骤
+        """
+        return self.costs if isinstance(self.costs, CostIndex) else CostIndex(self.costs)
+
+    def _imbalance(self):
+        """
+        :return: 总产量 - 总销量，在舍入误差以内时为 0
+        """
+        total_supply, total_demand = sum(i[1] for i in self.supply), sum(i[1] for i in self.demand)
+        difference = total_supply - total_demand
+        if abs(difference) <= 1e-9 * max(total_supply, total_demand):
+            return 0
+        return difference
+
+    def _balanced(self, index=None):
+        """
+        产销平衡的问题：已经平衡时就是自己，否则添加一个运价为 0 的虚拟销地或虚拟产地。
+        稀疏线路只添加虚拟节点的线路，不构造稠密的运价矩阵；
+        稠密运价不复制，虚拟的一行或一列由 CostIndex 表示(dummy)，表上作业法的各组件都把它当作运价为 0 的一行(列)
+        :param index: 稠密运价的 CostIndex，None 时现构造
+        :return: TransportationProblem
+        """
+        m, n = len(self.supply), len(self.demand)
+        difference = self._imbalance()
+        if difference == 0:
+            return self
+        supply, demand = list(self.supply), list(self.demand)
+        if difference > 0:
+            demand.append(('dummy', difference))
+        else:
+            supply.append(('dummy', -difference))
+
+        if isinstance(self.costs, SparseCosts):
+            dummy = np.arange(m if difference > 0 else n)
+            rows = np.concatenate([self.costs.rows, dummy if difference > 0 else np.full(n, m)])
+            cols = np.concatenate([self.costs.cols, np.full(m, n) if difference > 0 else dummy])
+            costs = np.concatenate([self.costs.costs, np.zeros(len(dummy), dtype=self.costs.costs.dtype)])
+            costs = SparseCosts(rows, cols, costs, (len(supply), len(demand)))
+        else:
+            index = self._dense_index() if index is None else index
+            costs = CostIndex(index.base, copy=False, dummy='col' if difference > 0 else 'row')
+        return TransportationProblem(supply, demand, costs)
+
+    def _components(self, index=None):
+        """
+        把允许的线路(稀疏问题中存在的线路，稠密运价中有限的运价)看作连接产地与销地的二部图，求出它的各个连通分量。
+        连通分量之间没有线路，可以分别求解。
+        :param index: 稠密运价的 CostIndex，None 时现构造；有限运价的掩码缓存在它上面
+        :return: [(产地索引, 销地索引), ...]，只列出有运量要安排的连通分量(可能为空)；
+                 不能分解(只有一个连通分量)，或某个连通分量的产销量无法满足时为 None (交给完整的问题处理)
+        """
+        m, n = len(self.supply), len(self.demand)
+        if isinstance(self.costs, SparseCosts):
+            rows, cols = self.costs.rows, self.costs.cols
+        else:
+            allowed = (self._dense_index() if index is None else index).finite
+            if allowed.all():
+                return None
+            rows, cols = np.nonzero(allowed)
+        labels = _connected_components(m + n, rows, m + cols)
+        order = np.argsort(labels, kind='stable')
+        groups = np.split(order, np.flatnonzero(np.diff(labels[order])) + 1)
+        if len(groups) == 1:
+            return None
+
+        quantities = np.array([i[1] for i in self.supply] + [i[1] for i in self.demand], dtype=float)
+        difference = self._imbalance()
+        tolerance = 1e-9 * max(quantities.max(), 1) * (m + n)
+        components = []
+        for group in groups:
+            rs, cs = group[group < m], group[group >= m] - m
+            component_difference = quantities[rs].sum() - quantities[m + cs].sum()
+            # 产大于销时多余的产量可以留在各个连通分量内(运往虚拟销地)，销大于产时反之；平衡时每个连通分量都要平衡
+            if difference >= 0 and component_difference < -tolerance or \
+                    difference <= 0 and component_difference > tolerance:
+                return None
+            if len(rs) > 0 and len(cs) > 0 and quantities[rs].sum() > 0 and quantities[m + cs].sum() > 0:
+                components.append((rs, cs))
+        return components
+
+    def _subproblem(self, rows, cols, index=None):
+        """
+        由 rows 这些产地与 cols 这些销地组成的子问题
+        :param rows: 产地索引(升序)
+        :param cols: 销地索引(升序)
+        :param index: 稠密运价的 CostIndex，None 时现构造
+        :return: TransportationProblem
+        """
+        supply = [self.supply[i] for i in rows.tolist()]
+        demand = [self.demand[j] for j in cols.tolist()]
+        if isinstance(self.costs, SparseCosts):
+            row_map = np.full(len(self.supply), -1)
+            col_map = np.full(len(self.demand), -1)
+            row_map[rows], col_map[cols] = np.arange(len(rows)), np.arange(len(cols))
+            keep = (row_map[self.costs.rows] >= 0) & (col_map[self.costs.cols] >= 0)
+            costs = SparseCosts(row_map[self.costs.rows[keep]], col_map[self.costs.cols[keep]], self.costs.costs[keep],
+                                (len(rows), len(cols)))
+        else:
+            index = self._dense_index() if index is None else index
+            costs = CostIndex(index.costs[np.ix_(rows, cols)], copy=False)
+        return TransportationProblem(supply, demand, costs)
+
+    def _stitch(self, components, results):
+        """
+        把各个连通分量(子问题)的结果拼成原问题的结果，统计信息相加，不含 basis
+        :param components: _components() 的结果
+        :param results: 各子问题的 TransportationResult
+        :return: TransportationResult
+        """
+        rows = [rs[r.rows] for (rs, _), r in zip(components, results)]
+        cols = [cs[r.cols] for (_, cs), r in zip(components, results)]
+        quantities = [r.quantities for r in results]
+        status = next((r.status for r in results if r.status != 'optimal'), 'optimal')
+        stats = SolveStats.merge([r.stats for r in results if r.stats is not None])
+        result = TransportationResult.from_cells(self, np.concatenate(rows), np.concatenate(cols),
+                                                 np.concatenate(quantities), None, stats, None, status)
+        if status != 'optimal':  # 各部分的下界之和，最优的部分取其总运价
+            bounds = [r.total_cost if r.status == 'optimal' else r.lower_bound for r in results]
+            result.lower_bound = None if any(b is None for b in bounds) else float(sum(bounds))
+        return result
+
+    def _table_costs(self, index=None):
+        """
+        表上作业法各组件共用的稠密运价表 CostIndex，每次求解只构造一次。
+        稀疏问题中不存在的线路、稠密运价中为 inf 的格子用一个足够大的运价 M 代替，求解后再检查它们没有被安排运量
+        :param index: 稠密运价的 CostIndex，None 时现构造
+        """
+        if isinstance(self.costs, SparseCosts):
+            return CostIndex(self.costs.toarray(fill_value=self._big_m(self.costs.costs)), copy=False)
+        index = self._dense_index() if index is None else index
+        if index.finite.all():
+            return index
+        finite = np.isfinite(index.base)
+        return index.with_base(np.where(finite, index.base, self._big_m(index.base[finite])))
+
+    def _big_m(self, costs) -> float:
+        """
+        比任何只用可用线路的方案都贵的运价 M
+        :param costs: 可用线路的运价
+        """
+        total = sum(i[1] for i in self.supply)
+        return 2 * (total + 1) * (float(np.max(np.abs(costs), initial=0)) + 1)
+
+    def _warm_start(self, warm_start, costs, integer=False) -> TransportationBasis:
+        """
+        从之前的求解结果得到当前问题的一个可行基
+        :param warm_start: TransportationResult 或 TransportationBasis
+        :param costs: 当前问题(表上作业法使用)的运价
+        :param integer: 是否为整数模式
+        :return: TransportationBasis
+        """
+        shape = costs.shape
+        if isinstance(warm_start, TransportationResult):
+            basis = warm_start.basis
+            if basis is None:  # 结果里只有运量表，没有运量的格子(以及补上的虚拟产地、销地)都当作非基变量
+                keep = (warm_start.rows < shape[0]) & (warm_start.cols < shape[1])
+                plan = np.full(shape, np.nan)
+                plan[warm_start.rows[keep], warm_start.cols[keep]] = warm_start.quantities[keep]
+                basis = TransportationBasis(plan, costs, integer)
+        else:
+            basis = warm_start
+        if basis.shape != shape:
+            if abs(basis.shape[0] - shape[0]) > 1 or abs(basis.shape[1] - shape[1]) > 1:
+                raise ValueError(f'warm start basis shape {basis.shape} does not match the problem {shape}')
+            # 只差一个虚拟产地或销地(产销平衡的情况变了)：把两者共有的基变量交给最小元素法优先安排
+            m, n = min(basis.shape[0], shape[0]), min(basis.shape[1], shape[1])
+            rows, cols = np.nonzero(basis.is_basic[:m, :n])
+            initer = MinimumElementIniter(self.supply, self.demand, costs, preferred=rows * shape[1] + cols)
+            return TransportationBasis(initer.init(), costs, integer)
+        if not basis.index.same_costs(costs) or basis.integer != integer:
+            # 运价变了：基变量不变，重算位势
+            basis = TransportationBasis(basis.tolist(), costs, integer)
+
+        supply, demand = [i[1] for i in self.supply], [i[1] for i in self.demand]
+        repaired = basis.with_quantities(supply, demand)
+        if repaired is None:  # 原来的基对新的产量销量不可行：优先在原来的基变量上重新安排运量
+            initer = MinimumElementIniter(self.supply, self.demand, costs, preferred=np.flatnonzero(basis.is_basic))
+            repaired = TransportationBasis(initer.init(), costs, integer)
+        return repaired
+
+    def _perturbed(self, integer=False) -> (list, list):
+        """
+        扰动后的产地、销地：a_i + ε (i = 1..m)，b_n + mε。
+        产销量都是整数时取 ε = 1/(2m)，这样扰动后问题的最优基对原问题仍可行，且换基中不会出现运量为 0 的基变量。
+        此时把产销量都乘以 2m，扰动后仍是整数，初始化与换基都没有舍入误差
+        """
+        m = len(self.supply)
+        supply, demand = [i[1] for i in self.supply], [i[1] for i in self.demand]
+        if integer or all(q == int(q) for q in supply + demand):
+            supply = [2 * m * int(q) + 1 for q in supply]
+            demand = [2 * m * int(q) for q in demand]
+            demand[-1] += m
+        else:
+            epsilon = 1e-9 * max(max(supply), 1)
+            supply = [q + epsilon for q in supply]
+            demand[-1] += m * epsilon
+        return ([(i[0], q) for i, q in zip(self.supply, supply)],
+                [(i[0], q) for i, q in zip(self.demand, demand)])
+
+    def _iterate(self, checker, optimizer, transportation, stats, max_iter=None, deadline=None, gap=None,
+                 allowed=None):
+        """
+        检验、调整，迭代求解
+        :param gap: 相对最优性间隙，当前方案与位势下界之差不超过它时停止；需要 transportation 为 TransportationBasis
+        :param allowed: 可用线路的布尔掩码，运价表中用大 M 代替了不可用的线路时才有。方案还用着不可用的线路时
+                        不是可行方案，max_iter、time_limit、gap 都要等它们的运量清零后才生效(第一阶段)
+        :return: (transportation, status)，status 为 'optimal'、'iteration_limit'、'time_limit' 或 'gap_limit'
+        """
+        unavailable = None if allowed is None else np.flatnonzero(~allowed)
+        while True:
+            with stats.timer('check'):
+                sigma, is_best = checker.check(transportation)
+            stats.checks += 1
+            if not isinstance(transportation, TransportationBasis):  # 每次检验都重新计算全部位势
+                stats.potential_updates += len(self.supply) + len(self.demand)
+            stats.emit('check', sigma=sigma, is_best=is_best)
+            if is_best:
+                return transportation, 'optimal'
+            if unavailable is not None and len(unavailable) > 0 and self._ships_on(transportation, unavailable):
+                pass  # 第一阶段：先把运量从不可用的线路上移走
+            elif max_iter is not None and stats.pivots >= max_iter:
+                return transportation, 'iteration_limit'
+            elif deadline is not None and time.perf_counter() >= deadline:
+                return transportation, 'time_limit'
+            elif gap is not None:
+                objective = stats.objective[-1]
+                bound = transportation.lower_bound([i[1] for i in self.supply], [i[1] for i in self.demand],
+                                                   allowed)
+                if objective - bound <= gap * abs(objective):
+                    return transportation, 'gap_limit'
+            with stats.timer('optimize'):
+                transportation = optimizer.optimize(transportation, sigma)
+            stats.record_pivot(optimizer)
+
+    @staticmethod
+    def _ships_on(transportation, cells) -> bool:
+        """
+        :param cells: 展平后的格子下标
+        :return: 方案在这些格子上是否有运量
+        """
+        if isinstance(transportation, TransportationBasis):
+            return bool(np.any(transportation.transportation.ravel()[cells] > 0))
+        return bool(np.any(np.nan_to_num(np.array(transportation, dtype=float)).ravel()[cells] > 0))
+
+    def solve(self, initer_class=MinimumElementIniter, checker_class=PotentialChecker, optimizer_class=ClosedLoopAdjustmentOptimizer,
+              pricing_class=None, solver_class=None, warm_start=None, callback=None, dtype=None,
+              integer=False, max_iter=None, time_limit=None, perturb=False, balance=True, decompose=True,
+              gap=None):
         """
         对运输问题当前问题求解
         :param initer_class:    初始方案求解器，TransportationIniter 的子类
         :param checker_class:   最优方案检验器，TransportationChecker 的子类
         :param optimizer_class: 运输方案优化器，TransportationOptimizer 的子类
+        :param pricing_class:   定价规则，TransportationPricing 的子类，None 表示由检验器计算全部检验数。
+                                需要检验器与优化器都支持 TransportationBasis (如 SpanningTreePotentialChecker)
+        :param solver_class:    求解器，TransportationSolver 的子类(如 NetworkSimplexSolver)。
+                                给定时直接用它求解，不再使用 initer、checker、optimizer。
+                                稀疏问题(SparseCosts)没有指定表上作业法的任何选项时默认用 NetworkSimplexSolver，
+                                内存与线路条数成正比，不构造稠密的运价表
+        :param warm_start:      热启动：之前求解得到的 TransportationResult 或 TransportationBasis。
+                                保留它的基变量，按当前的运价重算位势、按当前的产量销量重算运量；
+                                若这样不可行，则先在原来的基变量上、再在其余格子上用最小元素法重新安排运量。
+                                产销平衡的情况变了(多出或少了虚拟的产地、销地)时也这样重新安排。
+                                热启动时不使用 initer
+        :param callback:        求解过程中的事件回调 callback(event, info)，见 SolveStats。
+                                各阶段用时与换基次数等统计信息在结果的 stats 中
+        :param dtype:           结果中运量的数据类型(如 np.float32)，None 为 float64 (整数模式下为 int64)
+        :param integer:         整数模式：产量、销量必须是整数，运量用 int64 保存，运价都是整数时位势与检验数也是精确的整数，
+                                不会因浮点误差产生多余的换基。需要检验器与优化器都支持 TransportationBasis
+        :param max_iter:        最多换基次数，None 为不限
+        :param time_limit:      求解时限(秒)，None 为不限。
+                                达到 max_iter 或 time_limit 时停止迭代，返回当前(可行、目前最好的)方案，结果的 status 说明停止的原因。
+                                稀疏线路或有 inf 运价的问题，要等方案不再用到不可用的线路后限制才生效，
+                                因此返回的总是可行方案。
+                                提前停止的结果带有由位势得到的下界 lower_bound 与相对间隙 gap，见 TransportationResult
+        :param perturb:         扰动产量、销量以避免退化：先求解 a_i + ε、b_n + mε 的问题，再把得到的基用于原问题。
+                                需要检验器与优化器都支持 TransportationBasis
+        :param balance:         产销不平衡时，自动添加一个运价为 0 的虚拟销地(产大于销)或虚拟产地(销大于产)，
+                                结果中不含虚拟的产地、销地。为 False 时产销不平衡会抛出 ValueError
+        :param decompose:       允许的线路(稀疏问题中存在的线路，稠密运价中有限的运价)把问题分成互不相连的几部分时，
+                                分别求解各部分，再拼成一个结果(不含 basis，stats 为各部分之和)。
+                                max_iter、time_limit 作用于每一部分，callback 收到各部分的事件。热启动时不分解。
+                                要并行求解各部分，见 solve_decomposed
+        :param gap:             近似求解：当前方案的总运价与位势下界的相对间隙不超过 gap (如 0.01) 时停止，status 为 'gap_limit'。
+                                每次检验后多算一次 O(mn) 的下界。None 为求到最优。需要检验器与优化器都支持 TransportationBasis
         :return: 若求解成功则返回 TransportationResult ，否则为 None
         """
         assert issubclass(initer_class, TransportationIniter)
         assert issubclass(checker_class, TransportationChecker)
         assert issubclass(optimizer_class, TransportationOptimizer)
-        # TODO: check 产销平衡
+        if pricing_class is not None:
+            assert issubclass(pricing_class, TransportationPricing)
+            assert checker_class.accepts_basis and optimizer_class.accepts_basis
+        if integer or perturb or gap is not None:
+            assert checker_class.accepts_basis and optimizer_class.accepts_basis
+        index = self._validate()
+        if integer:
+            if any(i[1] != int(i[1]) for i in list(self.supply) + list(self.demand)):
+                raise ValueError('integer mode requires integral supply and demand')
+        if not balance and self._imbalance() != 0:
+            raise ValueError('unbalanced transportation problem: total supply != total demand')
+        if solver_class is None and isinstance(self.costs, SparseCosts) and initer_class is MinimumElementIniter \
+                and checker_class is PotentialChecker and optimizer_class is ClosedLoopAdjustmentOptimizer \
+                and pricing_class is None and warm_start is None and not integer and not perturb \
+                and max_iter is None and time_limit is None and gap is None:
+            solver_class = NetworkSimplexSolver  # 表上作业法要把稀疏的线路补成稠密的运价表
+        options = dict(initer_class=initer_class, checker_class=checker_class, optimizer_class=optimizer_class,
+                       pricing_class=pricing_class, solver_class=solver_class, callback=callback, dtype=dtype,
+                       integer=integer, max_iter=max_iter, time_limit=time_limit, perturb=perturb, decompose=False,
+                       gap=gap)
+        # 分解为互不相连的子问题
+        components = self._components(index) if decompose and warm_start is None else None
+        if components:  # 没有运量要安排(空列表)时照常求解
+            results = [self._subproblem(rs, cs, index).solve(**options) for rs, cs in components]
+            return self._stitch(components, results)
+        # 产销平衡
+        balanced = self._balanced(index)
+        if balanced is not self:
+            result = balanced.solve(warm_start=warm_start, balance=False, **options)
+            keep = (result.rows < len(self.supply)) & (result.cols < len(self.demand))  # 去掉虚拟的产地、销地
+            stripped = TransportationResult.from_cells(self, result.rows[keep], result.cols[keep],
+                                                       result.quantities[keep], result.basis, result.stats, None,
+                                                       result.status)
+            stripped.lower_bound = result.lower_bound  # 虚拟的产地、销地运价为 0，下界不变
+            return stripped
+
+        stats = SolveStats(callback)
+        deadline = None if time_limit is None else time.perf_counter() + time_limit
+        if solver_class is not None:
+            assert issubclass(solver_class, TransportationSolver)
+            solver = solver_class(self.supply, self.demand, self.costs)
+            with stats.timer('solve'):
+                rows, cols, quantities = solver.solve_cells()  # 只取有运量的格子，不构造 m×n 的运量表
+            stats.pivots = solver.iterations
+            with stats.timer('result'):
+                result = TransportationResult.from_cells(self, rows, cols, quantities, stats=stats, dtype=dtype)
+            stats.emit('done', result=result)
+            return result
 
         try:
-            # 实例化各个组件
-            initer = initer_class(self.supply, self.demand, self.costs)
-            checker = checker_class(self.supply, self.demand, self.costs)
-            optimizer = optimizer_class(self.supply, self.demand, self.costs)
+            # 实例化各个组件，共用同一个 CostIndex
+            costs = self._table_costs(index)
+            initer = initer_class(self.supply, self.demand, costs)
+            if pricing_class is not None:
+                checker = checker_class(self.supply, self.demand, costs, pricing_class=pricing_class)
+            else:
+                checker = checker_class(self.supply, self.demand, costs)
+            optimizer = optimizer_class(self.supply, self.demand, costs)
+            if pricing_class is not None:
+                optimizer.leaving_rule = pricing_class.leaving_rule
+            use_basis = checker.accepts_basis and optimizer.accepts_basis
+            allowed = None  # 可用的线路；运价表中用大 M 代替了不可用的线路时才有
+            if costs is not index:
+                if isinstance(self.costs, SparseCosts):
+                    allowed = np.zeros(costs.shape, dtype=bool)
+                    allowed[self.costs.rows, self.costs.cols] = True
+                else:
+                    allowed = index.finite
             # 初始化
-            transportation = initer.init()
+            with stats.timer('init'):
+                if perturb:  # 先求解扰动后的问题，再把它的基用于原问题
+                    supply, demand = self._perturbed(integer)
+                    initer = initer_class(supply, demand, costs)
+                    warm_start = TransportationBasis(initer.init(), costs, integer)
+                    warm_start, _ = self._iterate(checker, optimizer, warm_start, stats, max_iter, deadline,
+                                                  allowed=allowed)
+                if warm_start is not None:
+                    transportation = self._warm_start(warm_start, costs, integer)
+                    if not use_basis:
+                        transportation = transportation.tolist()
+                else:
+                    transportation = initer.init()
+                    # 检验器与优化器都支持时，用一个 TransportationBasis 在迭代间共享运量、基与位势
+                    if use_basis:
+                        transportation = TransportationBasis(transportation, costs, integer)
+            if use_basis:
+                stats.objective.append(float(transportation.index.total(transportation.transportation)))
+                potential_updates = transportation.potential_updates - stats.potential_updates
+            else:
+                stats.objective.append(float(costs.total(np.array(transportation, dtype=float))))
+            stats.emit('init', transportation=transportation)
             # 检验、调整，迭代求解
-            sigma, is_best = checker.check(transportation)
-            while not is_best:
-                transportation = optimizer.optimize(transportation, sigma)
-                sigma, is_best = checker.check(transportation)
+            transportation, status = self._iterate(checker, optimizer, transportation, stats, max_iter, deadline, gap,
+                                                   allowed)
 
-            return TransportationResult(self, transportation)
+            with stats.timer('result'):
+                if isinstance(transportation, TransportationBasis):
+                    stats.potential_updates = transportation.potential_updates - potential_updates
+                    rs, cs = np.nonzero(transportation.transportation)
+                    result = TransportationResult.from_cells(self, rs, cs, transportation.transportation[rs, cs],
+                                                             transportation, stats, dtype, status)
+                else:
+                    result = TransportationResult(self, np.array(transportation, dtype=float), None, stats, dtype,
+                                                  status)
+                if status != 'optimal':  # 提前停止：由当前的位势得到最优总运价的下界
+                    basis = transportation if isinstance(transportation, TransportationBasis) else \
+                        TransportationBasis(transportation, costs)
+                    result.lower_bound = basis.lower_bound([i[1] for i in self.supply], [i[1] for i in self.demand],
+                                                           allowed)
+                if allowed is not None and not np.all(allowed[result.rows, result.cols]):  # 最优方案仍用着大 M
+                    raise RuntimeError('infeasible transportation problem: no feasible plan on the given lanes')
+            stats.emit('done', result=result)
+            return result
         except Exception as e:
             # print(e)
             raise e
@@ -61,21 +504,144 @@ class TransportationProblem(object):
 class TransportationResult(object):
     """
     TransportationResult 是运输问题的求解结果
+
+    运输方案只保存有运量的格子 (稀疏表示)，运量表、总运价在用到时才计算。
+
+    属性：
+        - problem: 原问题
+        - rows, cols, quantities: 有运量的格子的行索引、列索引与运量
+        - transportation: 运量表 (list)
+        - total_cost: 总运价
+        - basis: 最优解对应的 TransportationBasis，可用于热启动；不是用 TransportationBasis 求解的则为 None
+        - stats: 求解的统计信息 SolveStats
+        - status: 'optimal' 为最优解；'iteration_limit'、'time_limit' 或 'gap_limit' 为达到换基次数、时间或间隙的限制时的可行方案
+        - lower_bound: 提前停止时由位势得到的最优总运价的下界，最优解或没有下界时为 None
+        - gap: 相对最优性间隙 (total_cost - lower_bound) / |total_cost|，最优解为 0.0，没有下界时为 None
+        - sensitivity: 灵敏度分析 SensitivityAnalysis：对偶价格、检验数、运价范围与产销量范围
     """
 
-    def __init__(self, problem: TransportationProblem, transportation):
-        for i, row in enumerate(transportation):
-            for j, element in enumerate(row):
-                if np.isnan(element):
-                    transportation[i][j] = 0.0
+    def __init__(self, problem: TransportationProblem, transportation, basis=None, stats=None, dtype=None,
+                 status='optimal'):
+        """
+        :param transportation: 运量表，nan 与 0 都表示没有运量
+        :param dtype: 运量的数据类型(如 np.float32、np.int64)，None 为 transportation 本身的类型
+        """
+        transportation = np.asarray(transportation)
+        if transportation.dtype.kind == 'f':
+            transportation = np.nan_to_num(transportation)
+        rows, cols = np.nonzero(transportation)
+        self._assign(problem, rows, cols, transportation[rows, cols], basis, stats, dtype, status)
+
+    @classmethod
+    def from_cells(cls, problem: TransportationProblem, rows, cols, quantities, basis=None, stats=None, dtype=None,
+                   status='optimal'):
+        """
+        由有运量的格子构造，不经过稠密的运量表
+        :param rows, cols, quantities: 有运量的格子的行索引、列索引与运量
+        """
+        result = cls.__new__(cls)
+        result._assign(problem, np.asarray(rows), np.asarray(cols), np.asarray(quantities), basis, stats, dtype, status)
+        return result
+
+    def _assign(self, problem, rows, cols, quantities, basis, stats, dtype, status):
         self.problem = problem
-        self.transportation = transportation
-        self.total_cost = np.sum(np.array(problem.costs) * np.array(transportation))
+        self.shape = (len(problem.supply), len(problem.demand))
+        index_dtype = np.int32 if max(self.shape) < 2 ** 31 else np.int64
+        self.rows = rows.astype(index_dtype)
+        self.cols = cols.astype(index_dtype)
+        self.quantities = quantities if dtype is None else quantities.astype(dtype)
+        self.basis = basis
+        self.stats = stats
+        self.status = status
+        self.lower_bound = None
+
+    def toarray(self) -> np.ndarray:
+        """
+        :return: 稠密的运量表 ndarray
+        """
+        transportation = np.zeros(self.shape, dtype=self.quantities.dtype)
+        transportation[self.rows, self.cols] = self.quantities
+        return transportation
+
+    @cached_property
+    def transportation(self) -> list:
+        return self.toarray().tolist()
+
+    @cached_property
+    def total_cost(self):
+        # 只在有运量的格子上算运价，这样不可用线路(运价为 inf)不会让总运价变成 nan
+        costs = self.problem.costs
+        if isinstance(costs, SparseCosts):
+            costs = costs.lookup(self.rows, self.cols)
+        elif isinstance(costs, (list, tuple)):  # 嵌套的 list 不必整个转为 ndarray
+            costs = np.array([costs[r][c] for r, c in zip(self.rows.tolist(), self.cols.tolist())])
+        elif isinstance(costs, CostIndex):  # 不补齐虚拟的产地、销地
+            costs = costs.lookup(self.rows, self.cols)
+        else:
+            costs = np.asarray(costs)[self.rows, self.cols]
+        return np.sum(costs * self.quantities)
+
+    @property
+    def gap(self):
+        if self.status == 'optimal':
+            return 0.0
+        if self.lower_bound is None:
+            return None
+        total_cost = float(self.total_cost)
+        return (total_cost - self.lower_bound) / max(abs(total_cost), np.finfo(float).tiny)
+
+    @cached_property
+    def sensitivity(self) -> SensitivityAnalysis:
+        if self.status != 'optimal':
+            raise ValueError(f'sensitivity analysis requires an optimal result, got {self.status!r}')
+        basis = self.basis if self.basis is not None else self._own_basis()
+        lanes = None
+        if isinstance(self.problem.costs, SparseCosts):
+            lanes = np.zeros(self.shape, dtype=bool)
+            lanes[self.problem.costs.rows, self.problem.costs.cols] = True
+        else:  # 运价为 inf 的格子不是可用的线路
+            finite = self.problem._dense_index().finite
+            lanes = None if finite.all() else finite
+        return SensitivityAnalysis(basis, self.shape, lanes)
+
+    def _own_basis(self) -> TransportationBasis:
+        """
+        没有 basis 时(位势法、求解器、缓存或并行求解的结果)，由这个方案自己的运量重建最优基，不重新求解。
+        退化时补上运量为 0 的基变量；补上的基变量使位势不满足最优条件时，按 Bland 规则做调整量为 0 的换基，
+        运量始终不变。需要调整量不为 0 的换基说明方案不是最优的，抛出 ValueError
+        :return: TransportationBasis (产销不平衡时含虚拟的产地或销地)
+        """
+        balanced = self.problem._balanced()
+        costs = balanced._table_costs()
+        m, n = self.shape
+        plan = np.zeros(costs.shape)
+        plan[self.rows, self.cols] = self.quantities
+        supply = np.array([i[1] for i in self.problem.supply], dtype=float)
+        demand = np.array([i[1] for i in self.problem.demand], dtype=float)
+        if costs.shape[1] > n:  # 虚拟销地收下各产地余下的产量
+            plan[:, n] = supply - plan[:, :n].sum(axis=1)
+        elif costs.shape[0] > m:  # 虚拟产地补足各销地余下的销量
+            plan[m, :] = demand - plan[:m, :].sum(axis=0)
+        tolerance = 1e-9 * max(supply.max(), demand.max(), 1)
+        basis = TransportationBasis(np.where(plan > tolerance, plan, np.nan), costs)
+
+        scale = 1e-9 * max(float(np.max(np.abs(basis.index.base))), 1)
+        while True:
+            sigma = basis.sigma()
+            negative = np.flatnonzero(np.where(basis.is_basic, 0, sigma) < -scale)
+            if len(negative) == 0:
+                return basis
+            r, c = np.unravel_index(negative[0], sigma.shape)
+            rows, cols = basis.get_closed_loop(r, c)
+            if np.min(basis.transportation[rows[1::2], cols[1::2]]) > tolerance:
+                raise ValueError('the transportation plan is not optimal, cannot rebuild an optimal basis from it')
+            basis.pivot(r, c, 'lowest_index')
 
     def __str__(self):
         echo = [['运量'] + [i[0] for i in self.problem.demand]]
-        for i in range(len(self.problem.costs)):
-            echo.append([self.problem.supply[i][0]] + [j for j in self.transportation[i]])
+        transportation = self.toarray()
+        for i in range(len(self.problem.supply)):
+            echo.append([self.problem.supply[i][0]] + transportation[i].tolist())
 
         s = f'Transportation problem optimized successfully. Result cost (total): {self.total_cost}\n'
         for r in echo:
@@ -84,3 +650,27 @@ class TransportationResult(object):
             s += '\n'
 
         return s
+
+
+def _connected_components(size, a, b) -> np.ndarray:
+    """
+    无向图的连通分量：每轮把每条边两端所在的树挂到编号较小的根上，再压缩路径，直到不再变化
+    :param size: 节点数
+    :param a, b: 各条边的两个端点
+    :return: 各节点所在连通分量的标号(分量中最小的节点编号)
+    """
+    labels = np.arange(size)
+    while True:
+        la, lb = labels[a], labels[b]
+        low = np.minimum(la, lb)
+        hooked = labels.copy()
+        np.minimum.at(hooked, la, low)
+        np.minimum.at(hooked, lb, low)
+        while True:  # 压缩路径，让每个节点直接指向根
+            jumped = hooked[hooked]
+            if np.array_equal(jumped, hooked):
+                break
+            hooked = jumped
+        if np.array_equal(hooked, labels):
+            return labels
+        labels = hooked
@@ -0,0 +1,142 @@
+import numpy as np
+
+from transportation_problem.basis import TransportationBasis
+
+
+class SensitivityAnalysis(object):
+    """
+    SensitivityAnalysis 最优解的灵敏度分析，由最优基的生成树一次算出
+
+    属性：
+        - u, v: 对偶价格(位势)，u_i + v_j 为从产地 i 到销地 j 多运一单位的边际运价
+        - reduced_costs: 检验数(既约运价) c_ij - u_i - v_j, m×n ndarray，基变量处为 0
+        - cost_lower, cost_upper: 运价范围, m×n ndarray。c_ij 单独在这个区间内变化时，当前的基仍是最优的
+                                  (非基变量的运价没有上限；稀疏问题中不存在的线路为 nan)
+
+    设 c_ij 变化 δ：
+        - 非基变量只改变自己的检验数，δ >= -σ_ij；
+        - 基变量 (i, j) 把生成树分成含产地 i 的 A 与含销地 j 的 B 两部分，B 中的 v 加 δ、u 减 δ，
+          产地在 A、销地在 B 的检验数减 δ，产地在 B、销地在 A 的检验数加 δ。
+    把行、列按生成树的先序遍历排列后，每棵子树的行、列都是连续的一段，
+    子树内的行与子树外的列(或反过来)上检验数的最小值可以由前缀、后缀最小值直接得到。
+    """
+
+    def __init__(self, basis: TransportationBasis, shape=None, lanes=None):
+        """
+        :param basis: 最优基
+        :param shape: 原问题的 (产地数, 销地数)；产销不平衡时 basis 含虚拟产地或销地，结果中去掉它们
+        :param lanes: 稀疏问题中存在的线路, bool ndarray；None 表示所有线路都存在
+        """
+        super().__init__()
+        self.basis = basis
+        m, n = basis.shape
+        self.shape = (m, n) if shape is None else tuple(shape)
+        costs = basis.costs.astype(float)
+        reduced_costs = costs - basis.u[:, None] - basis.v[None, :]
+        reduced_costs[basis.is_basic] = 0.0
+
+        # 先序遍历生成树，子树 x 的节点在 [tin[x], tout[x]) 中
+        children = [[] for _ in range(m + n)]
+        for x, p in enumerate(basis.parent):
+            if p >= 0:
+                children[p].append(x)
+        tin, tout = np.zeros(m + n, dtype=int), np.zeros(m + n, dtype=int)
+        clock, stack = 0, [(0, False)]
+        while stack:
+            x, done = stack.pop()
+            if done:
+                tout[x] = clock
+                continue
+            tin[x] = clock
+            clock += 1
+            stack.append((x, True))
+            stack.extend((y, False) for y in children[x])
+        row_order, col_order = np.argsort(tin[:m]), np.argsort(tin[m:])
+        row_tin, col_tin = tin[:m][row_order], tin[m:][col_order]
+
+        # 非基变量的检验数，基变量与不存在的线路为 inf；按先序排列后求各行的前缀/后缀最小值与各列的前缀/后缀最小值
+        fixed = basis.is_basic.copy()
+        if lanes is not None:
+            fixed[:lanes.shape[0], :lanes.shape[1]] |= ~lanes
+        d = np.where(fixed, np.inf, reduced_costs)[row_order][:, col_order]
+        inf_col, inf_row = np.full((m, 1), np.inf), np.full((1, n), np.inf)
+        row_prefix = np.hstack([inf_col, np.minimum.accumulate(d, axis=1)])
+        row_suffix = np.hstack([np.minimum.accumulate(d[:, ::-1], axis=1)[:, ::-1], inf_col])
+        col_prefix = np.vstack([inf_row, np.minimum.accumulate(d, axis=0)])
+        col_suffix = np.vstack([np.minimum.accumulate(d[::-1], axis=0)[::-1], inf_row])
+
+        cost_lower = costs - reduced_costs
+        cost_upper = np.full(basis.shape, np.inf)
+        for x, p in enumerate(basis.parent):
+            if p < 0:
+                continue
+            ra, rb = np.searchsorted(row_tin, (tin[x], tout[x]))
+            ca, cb = np.searchsorted(col_tin, (tin[x], tout[x]))
+            inside_out = np.minimum(row_prefix[ra:rb, ca], row_suffix[ra:rb, cb]).min(initial=np.inf)
+            outside_in = np.minimum(col_prefix[ra, ca:cb], col_suffix[rb, ca:cb]).min(initial=np.inf)
+            if x < m:  # 子树含产地 i
+                i, j, up, down = x, p - m, inside_out, outside_in
+            else:  # 子树含销地 j
+                i, j, up, down = p, x - m, outside_in, inside_out
+            cost_lower[i, j] = costs[i, j] - down
+            cost_upper[i, j] = costs[i, j] + up
+
+        m, n = self.shape
+        self.u = basis.u[:m].astype(float)
+        self.v = basis.v[:n].astype(float)
+        self.reduced_costs = reduced_costs[:m, :n]
+        self.cost_lower = cost_lower[:m, :n]
+        self.cost_upper = cost_upper[:m, :n]
+        if lanes is not None:
+            self.reduced_costs[~lanes] = np.nan
+            self.cost_lower[~lanes] = np.nan
+            self.cost_upper[~lanes] = np.nan
+
+    def quantity_range(self, i, j) -> (float, float):
+        """
+        产地 i 的产量与销地 j 的销量同时变化 δ 时，当前的基仍可行(因而仍最优)的 δ 的范围。
+        多出的运量沿生成树中 产地 i 到 销地 j 的路径运送，总运价变化 (u_i + v_j)δ
+        :param i: 产地索引
+        :param j: 销地索引
+        :return: (δ 的下限, δ 的上限)
+        """
+        rows, cols = self.basis.get_closed_loop(i, j)
+        # 闭回路上 (i, j) 之后的格子即为路径：奇数位置的运量加 δ，偶数位置的运量减 δ
+        transportation = self.basis.transportation
+        lower = -np.min(transportation[rows[1::2], cols[1::2]])
+        upper = np.min(transportation[rows[2::2], cols[2::2]], initial=np.inf)
+        return float(lower), float(upper)
+
+
+# Tests
+def _sensitivity_analysis_test():
+    ct = [[3, 11, 3, 10], [1, 9, 2, 8], [7, 4, 10, 5]]
+    ts = [[np.nan, np.nan, 5, 2], [3, np.nan, np.nan, 1], [np.nan, 6, np.nan, 3]]  # 最优解
+    basis = TransportationBasis(ts, ct)
+    sa = SensitivityAnalysis(basis)
+    assert np.all(sa.reduced_costs >= 0) and np.allclose(sa.u[:, None] + sa.v[None, :] + sa.reduced_costs, ct)
+    # 在范围内变动运价，基仍是最优的；超出范围则不是
+    for i, j in np.ndindex(basis.shape):
+        for c, optimal in ((sa.cost_lower[i, j] + 1e-6, True), (sa.cost_lower[i, j] - 1e-6, False),
+                           (sa.cost_upper[i, j] - 1e-6, True), (sa.cost_upper[i, j] + 1e-6, False)):
+            if np.isinf(c):
+                continue
+            changed = np.array(ct, dtype=float)
+            changed[i, j] = c
+            sigma = TransportationBasis(ts, changed).sigma()
+            assert (np.nanmin(sigma) >= -1e-9) == optimal, (i, j, c)
+    assert sa.quantity_range(0, 2) == (-5.0, np.inf)
+
+    # 没有 basis 的结果：由方案自己的运量重建基(退化时补运量为 0 的基变量)，不重新求解
+    from transportation_problem.problem import TransportationProblem
+    from transportation_problem.solver import NetworkSimplexSolver
+    problem = TransportationProblem([('A1', 2), ('A2', 2), ('A3', 5)], [('B1', 2), ('B2', 2), ('B3', 3)],
+                                    [[1, 1, 2], [1, 1, 2], [2, 2, 1]])
+    for result in (problem.solve(), problem.solve(solver_class=NetworkSimplexSolver)):
+        sa = result.sensitivity
+        assert np.array_equal(sa.basis.transportation[:3, :3], result.toarray()) and np.all(sa.reduced_costs >= 0)
+    print("sensitivity_analysis_test pass")
+
+
+if __name__ == '__main__':
+    _sensitivity_analysis_test()
@@ -0,0 +1,255 @@
+import asyncio
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from transportation_problem.problem import TransportationProblem, TransportationResult
+from transportation_problem.cache import SolveCache, _rebind, _reusable
+
+
+async def solve_async(problem: TransportationProblem, progress=None, executor=None, interval=0.1, **options):
+    """
+    在线程池中求解运输问题，不阻塞事件循环
+
+    等待它的任务被取消时，求解线程会在下一次检验或换基时停止(用求解器 solver_class 时要等求解完成)。
+
+    :param problem:  TransportationProblem
+    :param progress: 进度回调 progress(event, info)，在事件循环的线程中调用：
+                     'init' 事件，以及每隔 interval 秒最多一次的 'pivot' 事件(info 同 SolveStats，另有换基次数 pivots)
+    :param executor: concurrent.futures.Executor，None 为事件循环默认的线程池
+    :param interval: 两次 'pivot' 进度之间的最短间隔(秒)
+    :param options:  TransportationProblem.solve 的参数
+    :return: TransportationResult
+    """
+    loop = asyncio.get_running_loop()
+    cancelled = threading.Event()
+    callback = options.pop('callback', None)
+    state = dict(pivots=0, last=0.0)
+
+    def relay(event, info):  # 在求解线程中调用
+        if cancelled.is_set():
+            raise _Cancelled()
+        if callback is not None:
+            callback(event, info)
+        if event == 'pivot':
+            state['pivots'] += 1
+        if progress is None or event not in ('init', 'pivot'):
+            return
+        now = time.monotonic()
+        if event == 'init' or now - state['last'] >= interval:
+            state['last'] = now
+            loop.call_soon_threadsafe(progress, event, dict(info, pivots=state['pivots']))
+
+    future = loop.run_in_executor(executor, functools.partial(problem.solve, callback=relay, **options))
+    try:
+        return await future
+    except asyncio.CancelledError:
+        cancelled.set()
+        raise
+
+
+class SolveService(object):
+    """
+    SolveService 供 asyncio 服务使用的求解服务
+
+        - 并发有上限：同时排队与求解的请求最多 max_pending 个，更多的请求在 solve() 中等待(背压)；
+        - 大小分流：格子数不超过 small_size 的小问题与大问题使用各自的线程池，大问题求解时小问题不必排在它们后面；
+        - 合并请求：数据与求解参数都相同、还在求解中的请求只求解一次(见 SolveCache.fingerprint，在线程池中计算，
+          不阻塞事件循环)，给定 callback 的请求除外；
+        - 取消：等待同一个求解的请求都被取消后，求解线程随即停止；
+        - 给定 cache (SolveCache) 时先查缓存，求得的结果也放进缓存。
+
+    用法：
+        async with SolveService() as service:
+            result = await service.solve(problem, checker_class=tp.SpanningTreePotentialChecker)
+
+    属性：
+        - pending: 正在求解(含在线程池中排队)的求解数，合并的请求只算一次
+        - deduplicated: 合并到已有求解上的请求数
+    """
+
+    def __init__(self, max_workers=2, small_workers=2, small_size=10000, max_pending=64, cache=None, interval=0.1):
+        """
+        :param max_workers:   大问题线程池的线程数
+        :param small_workers: 小问题线程池的线程数
+        :param small_size:    小问题的格子数(产地数×销地数)上限
+        :param max_pending:   同时排队与求解的请求数上限
+        :param cache:         SolveCache，None 为不缓存
+        :param interval:      两次 'pivot' 进度之间的最短间隔(秒)
+        """
+        super().__init__()
+        self.small_size = small_size
+        self.max_pending = max_pending
+        self.cache = cache
+        self.interval = interval
+        self.pending = 0
+        self.deduplicated = 0
+        self._large = ThreadPoolExecutor(max_workers, thread_name_prefix='transportation-large')
+        self._small = ThreadPoolExecutor(small_workers, thread_name_prefix='transportation-small')
+        self._semaphore = None  # 在事件循环中创建
+        self._in_flight = {}  # 键 -> _InFlight
+
+    async def solve(self, problem: TransportationProblem, progress=None, **options) -> TransportationResult:
+        """
+        求解运输问题
+        :param problem:  TransportationProblem
+        :param progress: 进度回调，同 solve_async；合并的请求都会收到进度
+        :param options:  TransportationProblem.solve 的参数
+        :return: TransportationResult
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_pending)
+        async with self._semaphore:  # 超过 max_pending 个请求时在这里等待
+            return await self._solve(problem, progress, options)
+
+    async def _solve(self, problem, progress, options):
+        # 大问题的摘要要算一阵子，放到事件循环默认的线程池中
+        key = await asyncio.get_running_loop().run_in_executor(None, SolveCache.fingerprint, problem, options)
+        if self.cache is not None:
+            result = self.cache.get(key, problem, options)
+            if result is not None:
+                return result
+        if 'callback' in options:  # callback 在求解线程中调用，不能分给合并的请求
+            key = None
+
+        flight = self._in_flight.get(key) if key is not None else None
+        if flight is None:
+            flight = _InFlight()
+            flight.task = asyncio.ensure_future(self._run(problem, options, flight, key))
+            if key is not None:
+                self._in_flight[key] = flight
+        else:
+            self.deduplicated += 1
+        flight.waiters += 1
+        if progress is not None:
+            flight.listeners.append(progress)
+        try:
+            result = await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if not flight.task.done() and flight.waiters == 1:  # 没有别的请求在等这个求解了
+                flight.task.cancel()
+                if self._in_flight.get(key) is flight:  # 之后到达的相同请求重新求解，不要等这个被取消的求解
+                    del self._in_flight[key]
+            raise
+        finally:
+            flight.waiters -= 1
+            if progress is not None:
+                flight.listeners.remove(progress)
+        return _rebind(result, problem)
+
+    async def _run(self, problem, options, flight, key):
+        try:
+            self.pending += 1
+            try:
+                executor = self._small if len(problem.supply) * len(problem.demand) <= self.small_size else self._large
+                result = await solve_async(problem, flight.emit, executor, self.interval, **options)
+            finally:
+                self.pending -= 1
+        finally:
+            if key is not None and self._in_flight.get(key) is flight:
+                del self._in_flight[key]
+        if self.cache is not None and key is not None and _reusable(result, options):
+            self.cache.put(key, result)
+        return result
+
+    def close(self, wait=True):
+        """
+        关闭线程池
+        :param wait: 是否等待正在求解的问题完成
+        """
+        self._large.shutdown(wait=wait, cancel_futures=True)
+        self._small.shutdown(wait=wait, cancel_futures=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self.close(wait=False)
+
+
+class _InFlight(object):
+    """
+    一个正在进行的求解，以及等待它的请求
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.task = None
+        self.waiters = 0
+        self.listeners = []
+
+    def emit(self, event, info):
+        for listener in list(self.listeners):
+            listener(event, info)
+
+
+class _Cancelled(Exception):
+    pass
+
+
+# Tests
+def _solve_service_test():
+    from transportation_problem.initer import NorthwestCornerIniter
+    from transportation_problem.checker import SpanningTreePotentialChecker
+    import numpy as np
+
+    sp = [('A1', 14), ('A2', 27), ('A3', 19)]
+    dm = [('B1', 22), ('B2', 13), ('B3', 12), ('B4', 13)]
+    ct = [[6, 7, 5, 3], [8, 4, 2, 7], [5, 9, 10, 6]]
+    rng = np.random.default_rng(0)
+    m = n = 150
+    big = TransportationProblem([(i, 100) for i in range(m)], [(j, 100) for j in range(n)],
+                                rng.integers(1, 1000, (m, n)).tolist())
+
+    async def main():
+        events = []
+        r = await solve_async(TransportationProblem(sp, dm, ct), progress=lambda e, info: events.append(e),
+                              interval=0, initer_class=NorthwestCornerIniter, checker_class=SpanningTreePotentialChecker)
+        assert r.total_cost == 232 and events[0] == 'init' and 'pivot' in events
+
+        async with SolveService(max_workers=1, small_size=100) as service:
+            # 相同的请求只求解一次
+            a, b = await asyncio.gather(service.solve(TransportationProblem(sp, dm, ct)),
+                                        service.solve(TransportationProblem([('X', 14), ('Y', 27), ('Z', 19)], dm, ct)))
+            assert a.total_cost == b.total_cost == 232 and service.deduplicated == 1
+            assert b.problem.supply[0][0] == 'X'
+            # 取消大问题的求解
+            task = asyncio.ensure_future(service.solve(big, checker_class=SpanningTreePotentialChecker))
+            await asyncio.sleep(0.05)
+            small = await service.solve(TransportationProblem(sp, dm, ct), checker_class=SpanningTreePotentialChecker)
+            assert small.total_cost == 232 and not task.done()
+            task.cancel()
+            try:
+                await task
+                assert False, 'should be cancelled'
+            except asyncio.CancelledError:
+                pass
+            await asyncio.sleep(0)
+            assert not service._in_flight
+
+            # 取消之后立即到达的相同请求不受影响
+            task = asyncio.ensure_future(service.solve(big, checker_class=SpanningTreePotentialChecker))
+            await asyncio.sleep(0.05)
+            task.cancel()
+            again = asyncio.ensure_future(service.solve(big, checker_class=SpanningTreePotentialChecker))
+            await asyncio.sleep(0)
+            assert task.cancelled()
+            assert (await again).status == 'optimal'
+
+        # 背压：超过 max_pending 的请求在 solve() 入口等待，不会创建求解任务
+        async with SolveService(max_pending=1) as service:
+            first = asyncio.ensure_future(service.solve(big, checker_class=SpanningTreePotentialChecker))
+            await asyncio.sleep(0.05)
+            second = asyncio.ensure_future(service.solve(TransportationProblem(sp, dm, ct)))
+            await asyncio.sleep(0.05)
+            assert not second.done() and len(service._in_flight) == 1
+            first.cancel()
+            assert (await second).total_cost == 232
+
+    asyncio.run(main())
+    print("solve_service_test pass")
+
+
+if __name__ == '__main__':
+    _solve_service_test()
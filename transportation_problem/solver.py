@@ -0,0 +1,252 @@
+import numpy as np
+from transportation_problem.core import CostIndex
+from transportation_problem.lanes import SparseCosts
+
+
+class TransportationSolver(object):
+    """
+    TransportationSolver 直接求出最优运输方案的求解器，代替 初始化-检验-调整 的表上作业法流程
+
+    iterations 为求解中的换基次数
+    """
+
+    def __init__(self, supply: list, demand: list, costs: list):
+        super().__init__()
+        self.supply = [i[1] for i in supply]
+        self.demand = [i[1] for i in demand]
+        self.costs = costs if isinstance(costs, (SparseCosts, CostIndex)) else np.asarray(costs)
+        self.iterations = 0
+
+    def solve(self) -> list:
+        """
+        求解
+        :return: 最优运输方案，非基变量处为 nan
+        """
+        raise NotImplementedError
+
+    def solve_cells(self) -> (np.ndarray, np.ndarray, np.ndarray):
+        """
+        求解，只返回有运量的格子，不构造 m×n 的运量表。子类应覆盖它；默认由 solve() 的运量表得到
+        :return: (rows, cols, quantities) 有运量的格子的行索引、列索引与运量
+        """
+        transportation = np.nan_to_num(np.array(self.solve(), dtype=float))
+        rows, cols = np.nonzero(transportation)
+        return rows, cols, transportation[rows, cols]
+
+
+class NetworkSimplexSolver(TransportationSolver):
+    """
+    网络单纯形法
+
+    把运输问题看作二部图上的最小费用流：节点 0..m-1 为产地，m..m+n-1 为销地，m+n 为人工根节点，
+    每个可用的格子 (i, j) 是一条 i -> m+j 的弧(运价为 inf 的格子不可用；给定 SparseCosts 时只有其中的线路可用，
+    不会构造稠密的运价矩阵)。
+    从每个节点连一条大 M 运价的人工弧到根节点的强可行树出发，
+    用 parent / parent_edge / depth 数组与先序线索(next / prev / last)表示生成树，
+    分块定价选进基弧，出基弧取闭回路上(从顶点沿环方向)最后一个阻塞弧，以保持强可行、避免循环。
+    """
+
+    def __init__(self, supply: list, demand: list, costs: list, block_size=None):
+        super().__init__(supply, demand, costs)
+        self.block_size = block_size
+
+    def solve(self) -> list:
+        rows, cols, quantities = self._solve_basic()
+        transportation = np.full(self.costs.shape, np.nan)
+        transportation[rows, cols] = quantities
+        return transportation.tolist()
+
+    def solve_cells(self) -> (np.ndarray, np.ndarray, np.ndarray):
+        rows, cols, quantities = self._solve_basic()
+        positive = quantities > 0
+        return rows[positive], cols[positive], quantities[positive]
+
+    def _solve_basic(self) -> (np.ndarray, np.ndarray, np.ndarray):
+        """
+        在可用的弧上求解
+        :return: (rows, cols, quantities) 基变量(含运量为 0 的)的行索引、列索引与运量
+        """
+        if isinstance(self.costs, SparseCosts):
+            rows, cols, arc_costs = self.costs.rows, self.costs.cols, self.costs.costs
+        elif isinstance(self.costs, CostIndex):  # 不补齐虚拟的产地、销地
+            rows, cols = np.nonzero(self.costs.finite)
+            arc_costs = self.costs.lookup(rows, cols)
+        else:
+            rows, cols = np.nonzero(np.isfinite(self.costs))
+            arc_costs = self.costs[rows, cols]
+        self._solve_arcs(rows, cols, arc_costs.astype(float))
+        basic = self._basic[:len(rows)]
+        return rows[basic], cols[basic], np.array(self._flow[:len(rows)], dtype=float)[basic]
+
+    def _solve_arcs(self, rows, cols, arc_costs):
+        """
+        在 rows[k] -> m+cols[k] (运价 arc_costs[k]) 这些弧上求最小费用流，
+        结果在 self._flow (各弧流量) 与 self._basic (各弧是否为基) 中
+        """
+        m, n = len(self.supply), len(self.demand)
+        root = m + n
+        e0 = len(rows)  # 真实弧的条数，之后是 m+n 条人工弧
+        big = (m + n + 1) * (float(np.max(np.abs(arc_costs), initial=0)) + 1)
+
+        # 弧：tail -> head
+        quantity = list(self.supply) + list(self.demand)
+        tail = rows.tolist() + [k if k < m or quantity[k] == 0 else root for k in range(m + n)]
+        head = (m + cols).tolist() + [root if k < m or quantity[k] == 0 else k for k in range(m + n)]
+        self._flow = [0] * e0 + quantity
+        self._basic = np.zeros(e0 + m + n, dtype=bool)
+        self._basic[e0:] = True
+
+        # 位势：对基弧 c - pi[tail] + pi[head] = 0
+        pi = np.zeros(m + n + 1)
+        pi[:m + n] = [big if tail[e0 + k] == k else -big for k in range(m + n)]
+
+        # 生成树：一开始所有节点都挂在根上
+        parent = [root] * (m + n) + [-1]
+        parent_edge = list(range(e0, e0 + m + n)) + [-1]
+        depth = [1] * (m + n) + [0]
+        next_ = list(range(1, m + n + 1)) + [0]  # 先序线索
+        prev = [root] + list(range(m + n))
+        last = list(range(m + n)) + [m + n - 1]  # 子树在线索中的最后一个节点
+
+        tail_arr, head_arr = np.asarray(rows), m + np.asarray(cols)
+        tolerance = 1e-9 * big
+        block_size = self.block_size or max(1, int(np.ceil(np.sqrt(e0))))
+        blocks = max(1, (e0 + block_size - 1) // block_size)
+        next_block = 0
+
+        def find_entering():
+            nonlocal next_block
+            for b in range(blocks):
+                start = ((next_block + b) % blocks) * block_size
+                stop = min(start + block_size, e0)
+                rc = arc_costs[start:stop] - pi[tail_arr[start:stop]] + pi[head_arr[start:stop]]
+                rc[self._basic[start:stop]] = np.inf
+                k = int(np.argmin(rc)) if len(rc) else 0
+                if len(rc) and rc[k] < -tolerance:
+                    next_block = (start // block_size + 1) % blocks
+                    return start + k
+            return None
+
+        def trace_path(p, w):
+            nodes, edges = [p], []
+            while p != w:
+                edges.append(parent_edge[p])
+                p = parent[p]
+                nodes.append(p)
+            return nodes, edges
+
+        def remove_edge(s, t):
+            prev_t, last_t = prev[t], last[t]
+            next_last_t = next_[last_t]
+            parent[t] = parent_edge[t] = -1
+            next_[prev_t], prev[next_last_t] = next_last_t, prev_t
+            next_[last_t], prev[t] = t, last_t
+            while s != -1 and last[s] == last_t:
+                last[s] = prev_t
+                s = parent[s]
+
+        def make_root(q):
+            ancestors = []
+            while q != -1:
+                ancestors.append(q)
+                q = parent[q]
+            ancestors.reverse()
+            for p, q in zip(ancestors, ancestors[1:]):
+                last_p, prev_q, last_q = last[p], prev[q], last[q]
+                next_last_q = next_[last_q]
+                # p 成为 q 的孩子
+                parent[p], parent[q] = q, -1
+                parent_edge[p], parent_edge[q] = parent_edge[q], -1
+                # 把以 q 为根的子树从线索中摘下
+                next_[prev_q], prev[next_last_q] = next_last_q, prev_q
+                next_[last_q], prev[q] = q, last_q
+                if last_p == last_q:
+                    last[p] = last_p = prev_q
+                # p 余下的部分接在 q 的子树后面
+                prev[p], next_[last_q] = last_q, p
+                next_[last_p], prev[q] = q, last_p
+                last[q] = last_p
+
+        def add_edge(i, p, q):
+            last_p, last_q = last[p], last[q]
+            next_last_p = next_[last_p]
+            parent[q], parent_edge[q] = p, i
+            next_[last_p], prev[q] = q, last_p
+            prev[next_last_p], next_[last_q] = last_q, next_last_p
+            while p != -1 and last[p] == last_p:
+                last[p] = last_q
+                p = parent[p]
+
+        def update_subtree(i, p, q):
+            # 子树中各节点的位势平移同一个量，深度按先序重新计算
+            d = pi[p] - arc_costs[i] - pi[q] if q == head[i] else pi[p] + arc_costs[i] - pi[q]
+            nodes, x = [], q
+            while True:
+                nodes.append(x)
+                depth[x] = depth[parent[x]] + 1
+                if x == last[q]:
+                    break
+                x = next_[x]
+            pi[nodes] += d
+
+        while True:
+            i = find_entering()
+            if i is None:
+                break
+            self.iterations += 1
+            p, q = tail[i], head[i]
+            # 找闭回路的顶点
+            a, b = p, q
+            while a != b:
+                if depth[a] >= depth[b]:
+                    a = parent[a]
+                if depth[b] > depth[a]:
+                    b = parent[b]
+            w = a
+            # 闭回路：顶点 w -> ... -> p -(i)-> q -> ... -> w
+            nodes_p, edges_p = trace_path(p, w)
+            nodes_q, edges_q = trace_path(q, w)
+            cycle_edges = edges_p[::-1] + [i] + edges_q
+            cycle_from = nodes_p[:0:-1] + [p] + nodes_q[:-1]
+
+            # 出基弧：剩余容量最小的弧中沿环方向的最后一个
+            delta, j, j_pos = np.inf, i, -1
+            for pos, (e, u) in enumerate(zip(cycle_edges, cycle_from)):
+                if tail[e] != u and self._flow[e] <= delta:  # 反向弧才会阻塞
+                    delta, j, j_pos = self._flow[e], e, pos
+            if j_pos < 0:
+                raise RuntimeError('unbounded transportation problem')
+            # 沿闭回路调整流量
+            for e, u in zip(cycle_edges, cycle_from):
+                self._flow[e] += delta if tail[e] == u else -delta
+
+            if j != i:
+                self._basic[i], self._basic[j] = True, False
+                s, t = tail[j], head[j]
+                if parent[t] != s:
+                    s, t = t, s
+                if j_pos < len(edges_p):  # 出基弧在 p 那一侧，被断开的子树含 p
+                    p, q = q, p
+                remove_edge(s, t)
+                make_root(q)
+                add_edge(i, p, q)
+                update_subtree(i, p, q)
+
+        if any(self._flow[k] > 1e-9 * max(quantity, default=0) for k in range(e0, e0 + m + n)):
+            raise RuntimeError('infeasible transportation problem')
+
+
+# Tests
+def _network_simplex_solver_test():
+    sp = [('A', 400), ('B', 450), ('C', 70)]
+    dm = [('甲', 290), ('甲\'', 30), ('乙', 250), ('丙', 270), ('丙\'', 80)]
+    ct = [[15, 15, 18, 22, 22], [21, 21, 25, 16, 16], [np.inf, 0, np.inf, np.inf, 0]]
+    t = NetworkSimplexSolver(sp, dm, ct).solve()
+    assert np.nansum(np.array(t) * np.where(np.isfinite(ct), ct, 0)) == 14650, t
+    rows, cols, quantities = NetworkSimplexSolver(sp, dm, ct).solve_cells()
+    assert np.sum(np.array(ct)[rows, cols] * quantities) == 14650 and np.all(quantities > 0)
+    print("network_simplex_solver_test pass")
+
+
+if __name__ == '__main__':
+    _network_simplex_solver_test()
@@ -0,0 +1,117 @@
+import time
+from contextlib import contextmanager
+
+
+class SolveStats(object):
+    """
+    SolveStats 一次求解的统计信息，求解后在 TransportationResult.stats 中
+
+    给定 callback 时，求解过程中的事件会以 callback(event, info) 的形式通知：
+        - 'init':  初始化完成，info: transportation
+        - 'check': 一次检验完成，info: sigma, is_best
+        - 'pivot': 一次调整(换基)完成，info: entering (r, c), sigma, adjustment, loop_length, objective
+        - 'done':  求解完成，info: result
+
+    属性：
+        - timings: 各阶段累计用时(秒)，{'init', 'check', 'optimize', 'result'}，用求解器时为 {'solve', 'result'}
+        - checks: 检验次数
+        - pivots: 换基次数
+        - degenerate_pivots: 调整量为 0 的换基次数
+        - loop_length_total, loop_length_max: 闭回路长度(格子数)的总和与最大值
+        - potential_updates: 重新计算的位势个数
+        - objective: 初始方案与每次换基后的总运价(按表上作业法使用的运价计算)
+    """
+
+    def __init__(self, callback=None):
+        super().__init__()
+        self.callback = callback
+        self.timings = {}
+        self.checks = 0
+        self.pivots = 0
+        self.degenerate_pivots = 0
+        self.loop_length_total = 0
+        self.loop_length_max = 0
+        self.potential_updates = 0
+        self.objective = []
+
+    @classmethod
+    def merge(cls, stats_list):
+        """
+        把分别求解的各部分的统计信息相加：计数与各阶段用时相加，目标值为各部分初始值之和，再依次加上各部分每次换基的变化
+        :param stats_list: SolveStats 的列表
+        :return: SolveStats
+        """
+        merged = cls()
+        for stats in stats_list:
+            merged.checks += stats.checks
+            merged.pivots += stats.pivots
+            merged.degenerate_pivots += stats.degenerate_pivots
+            merged.loop_length_total += stats.loop_length_total
+            merged.loop_length_max = max(merged.loop_length_max, stats.loop_length_max)
+            merged.potential_updates += stats.potential_updates
+            for phase, seconds in stats.timings.items():
+                merged.timings[phase] = merged.timings.get(phase, 0.0) + seconds
+        if stats_list and all(stats.objective for stats in stats_list):
+            objective = sum(stats.objective[0] for stats in stats_list)
+            merged.objective.append(objective)
+            for stats in stats_list:
+                for before, after in zip(stats.objective, stats.objective[1:]):
+                    objective += after - before
+                    merged.objective.append(objective)
+        return merged
+
+    @contextmanager
+    def timer(self, phase):
+        """
+        累计 phase 阶段的用时
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[phase] = self.timings.get(phase, 0.0) + time.perf_counter() - start
+
+    def emit(self, event, **info):
+        if self.callback is not None:
+            self.callback(event, info)
+
+    def record_pivot(self, optimizer):
+        """
+        从优化器记录的上一次调整中更新计数与目标值
+        :param optimizer: TransportationOptimizer
+        """
+        self.pivots += 1
+        if optimizer.entering is None:
+            return
+        r, c, sigma = optimizer.entering
+        loop_length = len(optimizer.closed_loop[0])
+        self.loop_length_total += loop_length
+        self.loop_length_max = max(self.loop_length_max, loop_length)
+        if optimizer.adjustment == 0:
+            self.degenerate_pivots += 1
+        if self.objective:  # 总运价的变化量 = 进基变量的检验数 × 调整量
+            self.objective.append(self.objective[-1] + sigma * optimizer.adjustment)
+        self.emit('pivot', entering=(r, c), sigma=sigma, adjustment=optimizer.adjustment, loop_length=loop_length,
+                  objective=self.objective[-1] if self.objective else None)
+
+    def __str__(self):
+        s = f'checks: {self.checks}, pivots: {self.pivots} (degenerate: {self.degenerate_pivots}), '
+        s += f'loop length: {self.loop_length_total / max(self.pivots, 1):.1f} avg / {self.loop_length_max} max, '
+        s += f'potential updates: {self.potential_updates}\n'
+        s += ', '.join(f'{phase}: {seconds:.6f}s' for phase, seconds in self.timings.items())
+        return s
+
+
+# Tests
+def _solve_stats_test():
+    stats = SolveStats()
+    with stats.timer('check'):
+        pass
+    with stats.timer('check'):
+        pass
+    assert list(stats.timings) == ['check'] and stats.timings['check'] >= 0
+    print("solve_stats_test pass")
+
+
+if __name__ == '__main__':
+    _solve_stats_test()